@@ -4,9 +4,19 @@
 """
 
 import os
-import pickle
-import threading
+import time
+import logging
+import functools
+import weakref
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from batch_processing.index_storage import load_index as load_index_file, index_entry_keys
+
+logger = logging.getLogger(__name__)
+
+# Созданные процессоры поиска: release_shared_index убирает из них загруженный индекс
+_processors = weakref.WeakSet()
 
 
 class BatchSearchProcessor:
@@ -14,31 +24,140 @@ class BatchSearchProcessor:
     Класс для быстрого поиска по предварительно проиндексированным изображениям.
     """
 
-    def __init__(self):
+    def __init__(self, revalidate_interval=60.0):
         """
         Инициализация процессора.
+
+        Args:
+            revalidate_interval (float): Интервал в секундах, после которого
+                наличие файлов индекса на диске проверяется заново
         """
         self.indexes = {}  # {путь_к_индексу: данные_индекса}
+        self.revalidate_interval = revalidate_interval
 
-    def load_index(self, index_path):
+        _processors.add(self)
+
+    def load_index(self, index_path, mtime_ns=None):
         """
         Загрузка индекса из файла.
 
+        Загруженные индексы общие для всех процессоров: повторная загрузка
+        того же файла берется из кэша, а измененный на диске индекс загружается заново.
+
         Args:
             index_path (str): Путь к файлу индекса
+            mtime_ns (int, optional): Время изменения файла индекса, если вызывающий код
+                уже получил его (None - запросить у файловой системы)
 
         Returns:
             bool: True если индекс успешно загружен
         """
         try:
-            with open(index_path, 'rb') as f:
-                self.indexes[index_path] = pickle.load(f)
-            return True
+            if mtime_ns is None:
+                mtime_ns = os.stat(index_path).st_mtime_ns
+            index_data = _load_shared_index(index_path, mtime_ns)
         except Exception as e:
-            print(f"Ошибка при загрузке индекса {index_path}: {e}")
+            logger.error("Ошибка при загрузке индекса %s: %s", index_path, e)
             return False
 
-    def search_in_index(self, query_features, index_path, similarity_threshold=0.7, max_results=0):
+        self.indexes[index_path] = index_data
+        return True
+
+    @staticmethod
+    def _read_index(index_path):
+        """
+        Чтение индекса с диска и подготовка его к поиску.
+
+        Матрица векторных признаков отображается в память. Признаки
+        один раз подготавливаются экстрактором к пакетному сравнению.
+
+        Args:
+            index_path (str): Путь к файлу индекса
+
+        Returns:
+            dict: Данные индекса
+
+        Raises:
+            ValueError: Если экстрактор индекса не найден
+        """
+        index_data = load_index_file(index_path)
+
+        extractor = BatchSearchProcessor._find_extractor(index_data['extractor_name'])
+        if extractor is None:
+            raise ValueError(f"Не найден экстрактор {index_data['extractor_name']}")
+
+        features = index_data.pop('features')
+        if extractor.vector_features:
+            index_data['dim'] = features.shape[1]
+
+        index_data['prepared_features'] = extractor.prepare_index(
+            features,
+            normalized=index_data.get('normalized', False)
+        )
+        extractor.load_index(index_data['prepared_features'], index_path, index_entry_keys(index_data))
+
+        index_data['extractor'] = extractor
+        BatchSearchProcessor._validate_paths(index_data)
+
+        return index_data
+
+    @staticmethod
+    def _validate_paths(index_data):
+        """
+        Проверяет наличие файлов индекса на диске и сохраняет результат в маске.
+
+        Args:
+            index_data (dict): Данные загруженного индекса
+        """
+        paths = index_data['paths']
+        deleted = set(index_data.get('deleted', ()))
+        index_data['valid_mask'] = np.fromiter(
+            (i not in deleted and os.path.exists(p) for i, p in enumerate(paths)),
+            dtype=bool,
+            count=len(paths)
+        )
+        index_data['validated_at'] = time.monotonic()
+
+    @staticmethod
+    def _is_valid(index_data, i):
+        """
+        Проверяет, что файл записи индекса все еще существует.
+        Отсутствующий файл запоминается в маске, чтобы не проверять его повторно.
+
+        Args:
+            index_data (dict): Данные загруженного индекса
+            i (int): Номер записи индекса
+
+        Returns:
+            bool: True, если файл существует
+        """
+        if os.path.exists(index_data['paths'][i]):
+            return True
+
+        index_data['valid_mask'][i] = False
+        return False
+
+    @staticmethod
+    def _find_extractor(extractor_name):
+        """
+        Поиск экстрактора по имени.
+
+        Args:
+            extractor_name (str): Название экстрактора
+
+        Returns:
+            FeatureExtractor: Экстрактор или None, если не найден
+        """
+        from feature_extractors import AVAILABLE_EXTRACTORS
+
+        for ext in AVAILABLE_EXTRACTORS:
+            if ext.name == extractor_name:
+                return ext
+
+        return None
+
+    def search_in_index(self, query_features, index_path, similarity_threshold=0.7, max_results=0,
+                        index_mtime_ns=None):
         """
         Поиск похожих изображений в индексе.
 
@@ -47,73 +166,200 @@ class BatchSearchProcessor:
             index_path (str): Путь к индексу
             similarity_threshold (float): Порог сходства
             max_results (int): Максимальное количество результатов (0 - без ограничения)
+            index_mtime_ns (int, optional): Уже известное время изменения файла индекса
 
         Returns:
             list: Список кортежей (путь_к_изображению, сходство)
         """
-        # Загружаем индекс, если он еще не загружен
-        if index_path not in self.indexes:
-            if not self.load_index(index_path):
-                return []
+        # Загружаем индекс (из общего кэша, если файл не изменился)
+        if not self.load_index(index_path, index_mtime_ns):
+            return []
 
         index_data = self.indexes[index_path]
-        features_dict = index_data['features']
-        extractor_name = index_data['extractor_name']
 
-        # Получаем экстрактор, соответствующий индексу
-        from feature_extractors import AVAILABLE_EXTRACTORS
-        extractor = None
+        # Периодически перепроверяем наличие файлов вместо проверки при каждом запросе
+        if time.monotonic() - index_data['validated_at'] > self.revalidate_interval:
+            self._validate_paths(index_data)
 
-        for ext in AVAILABLE_EXTRACTORS:
-            if ext.name == extractor_name:
-                extractor = ext
-                break
+        # Приближенный поиск используется, только если число результатов ограничено
+        if 'ann_index' in index_data and max_results > 0:
+            return self._search_in_ann(
+                query_features,
+                index_data,
+                similarity_threshold,
+                max_results
+            )
 
-        if extractor is None:
-            print(f"Не найден экстрактор {extractor_name} для индекса {index_path}")
+        return self._search_in_prepared(
+            query_features,
+            index_data,
+            similarity_threshold,
+            max_results
+        )
+
+    def _search_in_prepared(self, query_features, index_data, similarity_threshold, max_results):
+        """
+        Поиск по подготовленным признакам индекса одним пакетным сравнением.
+
+        Args:
+            query_features: Признаки изображения запроса
+            index_data (dict): Данные загруженного индекса
+            similarity_threshold (float): Порог сходства
+            max_results (int): Максимальное количество результатов (0 - без ограничения)
+
+        Returns:
+            list: Список кортежей (путь_к_изображению, сходство)
+        """
+        paths = index_data['paths']
+        if not paths:
             return []
 
-        # Проверяем и преобразуем размерность вектора запроса
-        if hasattr(query_features, 'ndim') and query_features.ndim > 1:
-            query_features = query_features.reshape(-1)
+        extractor = index_data['extractor']
 
-        # Ищем похожие изображения
-        results = []
+        # Подготовка запроса выполняется один раз, а не для каждой записи индекса
+        if extractor.vector_features:
+            query_features = np.ascontiguousarray(np.asarray(query_features).reshape(-1), dtype=np.float32)
+            if query_features.shape[0] != index_data['dim']:
+                logger.warning("Несовпадение размерностей запроса и индекса: %d vs %d",
+                               query_features.shape[0], index_data['dim'])
+                return []
+
+        # Сравниваем запрос со всем индексом сразу
+        similarities = extractor.compare_features_batch(
+            query_features,
+            index_data['prepared_features']
+        )
 
-        for img_path, features in features_dict.items():
-            # Пропускаем изображения, которых больше нет на диске
-            if not os.path.exists(img_path):
+        # Отбираем существующие изображения выше порога
+        candidates = np.flatnonzero((similarities >= similarity_threshold) & index_data['valid_mask'])
+
+        results = []
+        for i in self._iter_by_similarity(similarities, candidates, max_results):
+            # Пропускаем изображения, удаленные после последней проверки
+            if not self._is_valid(index_data, i):
                 continue
 
-            # Преобразуем признаки из индекса, если необходимо
-            if hasattr(features, 'ndim') and features.ndim > 1:
-                features = features.reshape(-1)
+            results.append((paths[i], float(similarities[i])))
+
+            # Ограничиваем количество результатов, если нужно
+            if 0 < max_results <= len(results):
+                break
+
+        return results
+
+    @staticmethod
+    def _iter_by_similarity(similarities, candidates, k):
+        """
+        Перебор кандидатов по убыванию сходства.
+        Полностью сортируются только первые k кандидатов, выбранные np.argpartition;
+        остальные сортируются, только если первых не хватило.
+
+        Args:
+            similarities (numpy.ndarray): Вектор значений сходства
+            candidates (numpy.ndarray): Номера кандидатов
+            k (int): Ожидаемое количество результатов (0 - все)
+
+        Yields:
+            int: Номер кандидата
+        """
+        if 0 < k < len(candidates):
+            order = np.argpartition(-similarities[candidates], k - 1)
+            head, tail = candidates[order[:k]], candidates[order[k:]]
+        else:
+            head, tail = candidates, candidates[:0]
+
+        yield from head[np.argsort(-similarities[head], kind='stable')]
+        yield from tail[np.argsort(-similarities[tail], kind='stable')]
+
+    def _search_in_ann(self, query_features, index_data, similarity_threshold, max_results):
+        """
+        Приближенный поиск ближайших соседей по графу HNSW.
+        Проверяется наличие на диске только найденных кандидатов.
+
+        Args:
+            query_features: Признаки изображения запроса
+            index_data (dict): Данные загруженного индекса
+            similarity_threshold (float): Порог сходства
+            max_results (int): Максимальное количество результатов
+
+        Returns:
+            list: Список кортежей (путь_к_изображению, сходство)
+        """
+        paths = index_data['paths']
+        ann_index = index_data['ann_index']
 
-            # Проверяем совпадение размерностей
-            if hasattr(query_features, 'shape') and hasattr(features, 'shape'):
-                if query_features.shape != features.shape:
-                    # Если размерности не совпадают, пропускаем
-                    print(f"Несовпадение размерностей для {img_path}: {query_features.shape} vs {features.shape}")
+        query = np.asarray(query_features, dtype=np.float32).reshape(1, -1)
+        if query.shape[1] != index_data['dim']:
+            logger.warning("Несовпадение размерностей запроса и индекса: %d vs %d", query.shape[1], index_data['dim'])
+            return []
+
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        k = min(max_results * 2, len(paths))
+
+        while True:
+            scores, labels = ann_index.search(query, k)
+
+            # Скалярное произведение нормализованных векторов переводим в диапазон [0, 1]
+            similarities = (scores[0] + 1) / 2
+
+            results = []
+            exhausted = k >= len(paths)
+
+            for i, similarity in zip(labels[0], similarities):
+                # Кандидаты упорядочены по убыванию сходства
+                if i < 0 or similarity < similarity_threshold:
+                    exhausted = True
+                    break
+
+                if not index_data['valid_mask'][i] or not self._is_valid(index_data, i):
                     continue
 
-            try:
-                # Сравниваем признаки
-                similarity = extractor.compare_features(query_features, features)
+                results.append((paths[i], float(similarity)))
 
-                # Если сходство выше порога, добавляем в результаты
-                if similarity >= similarity_threshold:
-                    results.append((img_path, similarity))
-            except Exception as e:
-                print(f"Ошибка при сравнении признаков для {img_path}: {e}")
+                if len(results) >= max_results:
+                    return results
 
-        # Сортируем результаты по убыванию сходства
-        results.sort(key=lambda x: x[1], reverse=True)
+            if exhausted:
+                return results
 
-        # Ограничиваем количество результатов, если нужно
-        if max_results > 0:
-            results = results[:max_results]
+            # Часть кандидатов отсутствует на диске - расширяем выборку
+            k = min(k * 2, len(paths))
 
-        return results
+
+@functools.lru_cache(maxsize=8)
+def _load_shared_index(index_path, mtime_ns):
+    """
+    Загрузка индекса с кэшированием по пути и времени изменения файла.
+
+    Args:
+        index_path (str): Путь к файлу индекса
+        mtime_ns (int): Время изменения файла индекса в наносекундах
+
+    Returns:
+        dict: Данные индекса
+    """
+    return BatchSearchProcessor._read_index(index_path)
+
+
+def release_shared_index(index_path):
+    """
+    Освобождение загруженных версий индекса перед заменой его файлов.
+    Кэш и процессоры поиска держат отображенные в память файлы признаков,
+    из-за которых os.replace не может заменить их в Windows, а в Linux
+    замененные файлы продолжают занимать место на диске.
+
+    Args:
+        index_path (str): Путь к файлу индекса
+    """
+    # lru_cache не удаляет отдельные записи, очищается весь кэш
+    _load_shared_index.cache_clear()
+
+    for processor in list(_processors):
+        processor.indexes.pop(index_path, None)
 
 
 class MultiIndexSearch:
@@ -121,11 +367,26 @@ class MultiIndexSearch:
     Класс для параллельного поиска по нескольким индексам.
     """
 
-    def __init__(self):
+    def __init__(self, max_workers=None):
         """
         Инициализация поисковика.
+
+        Args:
+            max_workers (int, optional): Количество потоков поиска (по умолчанию - число ядер)
         """
         self.processor = BatchSearchProcessor()
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        # Пул потоков создается при первом поиске и используется повторно
+        self.pool = None
+
+    def close(self):
+        """
+        Завершение потоков поиска.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
 
     def search_in_multiple_indexes(self, query_features, index_paths, similarity_threshold=0.7, max_results=0):
         """
@@ -140,33 +401,27 @@ class MultiIndexSearch:
         Returns:
             list: Объединенный список результатов
         """
-        # Результаты поиска для каждого индекса
-        results_per_index = {}
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers)
 
-        # Функция поиска для каждого индекса
-        def search_in_one_index(index_path):
-            results = self.processor.search_in_index(
+        # Матричные операции numpy освобождают GIL, поэтому индексы обрабатываются параллельно
+        futures = [
+            self.pool.submit(
+                self.processor.search_in_index,
                 query_features,
                 index_path,
                 similarity_threshold,
                 max_results
             )
-            results_per_index[index_path] = results
+            for index_path in index_paths
+        ]
 
-        # Создаем потоки для каждого индекса
-        threads = []
-        for index_path in index_paths:
-            thread = threading.Thread(target=search_in_one_index, args=(index_path,))
-            threads.append(thread)
-            thread.start()
-
-        # Ожидаем завершения всех потоков
-        for thread in threads:
-            thread.join()
+        # Результаты поиска для каждого индекса
+        results_per_index = [future.result() for future in as_completed(futures)]
 
         # Объединяем результаты
         all_results = []
-        for results in results_per_index.values():
+        for results in results_per_index:
             all_results.extend(results)
 
         # Удаляем дубликаты (одно и то же изображение может быть в нескольких индексах)
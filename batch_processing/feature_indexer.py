@@ -5,11 +5,67 @@
 
 import os
 import time
-import pickle
-from pathlib import Path
+import logging
+from concurrent.futures import ProcessPoolExecutor
 
 from PyQt5.QtCore import QThread, pyqtSignal, QMutex, QMutexLocker
 
+from batch_processing.index_storage import (get_index_path, load_index, mark_deleted,
+                                            index_entry_keys, IndexWriter)
+from batch_processing.batch_search import release_shared_index
+from utils.file_utils import get_image_files
+
+logger = logging.getLogger(__name__)
+
+# Режимы индексации: обновление с повторным использованием признаков
+# неизмененных файлов, полная переиндексация или удаление записей
+# об отсутствующих файлах без извлечения признаков
+MODE_APPEND = "append"
+MODE_REBUILD = "rebuild"
+MODE_PRUNE = "prune"
+
+# Доля удаленных записей, при превышении которой индекс переписывается без них
+PRUNE_REBUILD_RATIO = 0.2
+
+# Наибольшее количество процессов пула индексации: каждый процесс держит
+# свою копию экстрактора и декодированные изображения в памяти
+MAX_PROCESS_WORKERS = 8
+
+# Минимальный интервал в секундах между сигналами прогресса индексации
+PROGRESS_INTERVAL = 0.05
+
+# Экстрактор, с которым работает дочерний процесс пула
+_process_extractor = None
+
+
+def _init_process(extractor):
+    """
+    Инициализация дочернего процесса пула индексации.
+
+    Args:
+        extractor: Экстрактор признаков
+    """
+    global _process_extractor
+    _process_extractor = extractor
+    _process_extractor.init_worker_process()
+
+
+def _extract_in_process(image_path):
+    """
+    Извлечение признаков в дочернем процессе пула.
+
+    Args:
+        image_path (str): Путь к изображению
+
+    Returns:
+        features: Признаки изображения или None в случае ошибки
+    """
+    try:
+        return _process_extractor.extract_features(image_path)
+    except Exception as e:
+        logger.debug("Ошибка при обработке %s: %s", image_path, e)
+        return None
+
 
 class FeatureIndexer(QThread):
     """
@@ -20,7 +76,7 @@ class FeatureIndexer(QThread):
     index_completed = pyqtSignal(str)
     index_failed = pyqtSignal(str)
 
-    def __init__(self, folder_path, extractor, output_path=None):
+    def __init__(self, folder_path, extractor, output_path=None, mode=MODE_APPEND):
         """
         Инициализация индексатора.
 
@@ -28,20 +84,19 @@ class FeatureIndexer(QThread):
             folder_path (str): Путь к папке с изображениями
             extractor: Экстрактор признаков
             output_path (str, optional): Путь для сохранения индекса
+            mode (str, optional): MODE_APPEND - извлекать признаки только новых и измененных
+                файлов, MODE_REBUILD - заново для всех файлов, MODE_PRUNE - только
+                удалить записи об отсутствующих файлах
         """
         super().__init__()
         self.folder_path = folder_path
         self.extractor = extractor
+        self.mode = mode
 
         # Если путь для сохранения не указан, создаем его в папке с изображениями
         if output_path is None:
-            extractor_name = extractor.name.replace(" ", "_").lower()
-            index_dir = os.path.join(folder_path, ".index")
-            os.makedirs(index_dir, exist_ok=True)
-            self.output_path = os.path.join(
-                index_dir,
-                f"image_index_{extractor_name}.pkl"
-            )
+            self.output_path = get_index_path(folder_path, extractor.name)
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
         else:
             self.output_path = output_path
 
@@ -50,6 +105,10 @@ class FeatureIndexer(QThread):
         self.running = True
         self.cancelled = False
 
+        # Последнее отправленное значение прогресса и время его отправки
+        self.last_progress = None
+        self.last_progress_time = 0.0
+
     def stop(self):
         """
         Остановка индексации.
@@ -58,61 +117,287 @@ class FeatureIndexer(QThread):
             self.running = False
             self.cancelled = True
 
-    def run(self):
+    def _emit_progress(self, progress):
         """
-        Выполняет индексацию изображений в указанной папке.
+        Отправка прогресса не чаще раза в PROGRESS_INTERVAL секунд.
+        Повторы того же значения пропускаются, завершение (100) отправляется всегда.
+
+        Args:
+            progress (int): Значение прогресса (0-100)
+        """
+        if progress == self.last_progress:
+            return
+
+        now = time.monotonic()
+        if progress < 100 and now - self.last_progress_time < PROGRESS_INTERVAL:
+            return
+
+        self.last_progress = progress
+        self.last_progress_time = now
+        self.progress_update.emit(progress)
+
+    @staticmethod
+    def _file_stat(image_path):
+        """
+        Получение ключа, по которому определяется, изменился ли файл.
+
+        Args:
+            image_path (str): Путь к изображению
+
+        Returns:
+            tuple: (mtime_ns, размер) или None, если файл недоступен
         """
         try:
-            # Получаем список изображений
-            image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
-            image_files = []
+            st = os.stat(image_path)
+        except OSError:
+            return None
 
-            for ext in image_extensions:
-                image_files.extend(list(Path(self.folder_path).glob(f'*{ext}')))
-                image_files.extend(list(Path(self.folder_path).glob(f'*{ext.upper()}')))
+        return st.st_mtime_ns, st.st_size
 
-            image_files = [str(path) for path in image_files]
-            total_files = len(image_files)
+    def _load_previous_index(self):
+        """
+        Загрузка предыдущей версии индекса для повторного использования признаков.
 
-            if total_files == 0:
-                self.index_failed.emit("В указанной папке не найдены изображения")
-                return
+        Returns:
+            dict: {путь_к_изображению: (mtime_ns, размер, признаки)} или пустой словарь
+        """
+        if self.mode == MODE_REBUILD or not os.path.exists(self.output_path):
+            return {}
+
+        try:
+            index_data = load_index(self.output_path)
+        except Exception as e:
+            print(f"Не удалось загрузить предыдущий индекс {self.output_path}: {e}")
+            return {}
+
+        # Признаки, сохраненные в другом виде, повторно не используются
+        if (index_data['extractor_name'] != self.extractor.name or 'mtimes' not in index_data
+                or index_data.get('normalized', False) != self.extractor.normalized_features):
+            return {}
+
+        deleted = set(index_data.get('deleted', ()))
+
+        return {
+            img_path: (mtime, size, features)
+            for i, (img_path, mtime, size, features) in enumerate(zip(
+                index_data['paths'],
+                index_data['mtimes'],
+                index_data['sizes'],
+                index_data['features']
+            ))
+            if i not in deleted
+        }
+
+    def _create_writer(self):
+        """
+        Создание записи индекса с параметрами экстрактора.
+
+        Returns:
+            IndexWriter: Запись индекса в output_path
+        """
+        return IndexWriter(
+            self.output_path,
+            self.extractor.name,
+            self.extractor.vector_features,
+            self.extractor.index_dtype,
+            self.extractor.ann_index,
+            self.extractor.normalized_features,
+            ragged=self.extractor.ragged_features
+        )
+
+    def _prune(self):
+        """
+        Удаление из индекса записей об отсутствующих файлах.
+
+        Отсутствующие записи помечаются в метаданных индекса. Если доля помеченных
+        записей превышает PRUNE_REBUILD_RATIO, индекс переписывается без них
+        из сохраненных признаков, извлечение признаков не выполняется.
+        """
+        if not os.path.exists(self.output_path):
+            self.index_failed.emit("Индекс не найден")
+            return
+
+        index_data = load_index(self.output_path)
+        paths = index_data['paths']
+        deleted = set(index_data.get('deleted', ()))
 
-            # Словарь для хранения признаков {путь_к_файлу: признаки}
-            features_dict = {}
+        for i, img_path in enumerate(paths):
+            if i not in deleted and not os.path.exists(img_path):
+                deleted.add(i)
 
-            # Обрабатываем каждое изображение
-            for i, img_path in enumerate(image_files):
-                # Проверяем флаг остановки
+        if not paths or len(deleted) <= PRUNE_REBUILD_RATIO * len(paths):
+            # Признаки отображены в память, освобождаем их до замены метаданных
+            index_data = None
+            mark_deleted(self.output_path, deleted)
+            self._emit_progress(100)
+            self.index_completed.emit(self.output_path)
+            return
+
+        writer = self._create_writer()
+
+        try:
+            for i, (img_path, mtime, size, features) in enumerate(zip(
+                    paths, index_data['mtimes'], index_data['sizes'], index_data['features'])):
                 with QMutexLocker(self.mutex):
                     if not self.running:
+                        writer.abort()
                         if self.cancelled:
                             self.index_failed.emit("Индексация была отменена")
                         return
 
-                try:
-                    # Извлекаем признаки
-                    features = self.extractor.extract_features(img_path)
+                if i not in deleted:
+                    writer.add(img_path, features, (mtime, size))
+
+                self._emit_progress(int(100 * (i + 1) / len(paths)))
+
+            # Освобождаем отображенные в память файлы старого индекса до его замены
+            index_data = None
+            features = None
+            release_shared_index(self.output_path)
+
+            writer.finalize()
 
-                    # Если признаки успешно извлечены, добавляем в словарь
+            if self.extractor.persistent_search_index:
+                self._save_search_index()
+
+        except Exception:
+            writer.abort()
+            raise
+
+        self.index_completed.emit(self.output_path)
+
+    def _save_search_index(self):
+        """
+        Построение и сохранение структур поиска экстрактора для записанного индекса.
+        Индекс уже сохранен, поэтому ошибка здесь не отменяет индексацию:
+        структуры будут построены при поиске.
+        """
+        try:
+            index_data = load_index(self.output_path)
+            prepared = self.extractor.prepare_index(
+                index_data['features'],
+                normalized=index_data.get('normalized', False)
+            )
+            self.extractor.save_index(prepared, self.output_path, index_entry_keys(index_data),
+                                     reuse=self.mode != MODE_REBUILD)
+        except Exception as e:
+            print(f"Не удалось сохранить структуры поиска для {self.output_path}: {e}")
+
+    def _iter_features(self, image_files):
+        """
+        Извлекает признаки изображений в порядке списка.
+
+        Экстракторы с use_process_pool обрабатываются пулом процессов,
+        остальные - пакетами по batch_size изображений в текущем потоке.
+
+        Args:
+            image_files (list): Список путей к изображениям
+
+        Yields:
+            tuple: (путь_к_изображению, признаки или None)
+        """
+        if self.extractor.use_process_pool and len(image_files) > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, MAX_PROCESS_WORKERS),
+                initializer=_init_process,
+                initargs=(self.extractor,)
+            )
+            try:
+                yield from zip(image_files, executor.map(_extract_in_process, image_files, chunksize=16))
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+            return
+
+        batch_size = self.extractor.batch_size
+        for start in range(0, len(image_files), batch_size):
+            batch = image_files[start:start + batch_size]
+            yield from zip(batch, self.extractor.extract_features_batch(batch))
+
+    def run(self):
+        """
+        Выполняет индексацию изображений в указанной папке.
+        """
+        try:
+            if self.mode == MODE_PRUNE:
+                self._prune()
+                return
+
+            # Получаем список изображений
+            image_files = get_image_files(self.folder_path)
+            total_files = len(image_files)
+
+            if total_files == 0:
+                self.index_failed.emit("В указанной папке не найдены изображения")
+                return
+
+            # Признаки записываются на диск по мере извлечения
+            writer = self._create_writer()
+
+            features_iter = None
+
+            try:
+                # Признаки неизмененных с прошлой индексации файлов берутся из старого индекса
+                previous = self._load_previous_index()
+                changed_files = []
+                file_stats = {}
+
+                for img_path in image_files:
+                    file_stat = self._file_stat(img_path)
+                    if file_stat is None:
+                        continue
+
+                    entry = previous.get(img_path)
+                    if entry is not None and entry[:2] == file_stat:
+                        writer.add(img_path, entry[2], file_stat)
+                    else:
+                        changed_files.append(img_path)
+                        file_stats[img_path] = file_stat
+
+                # Освобождаем отображенный в память файл старого индекса до его замены:
+                # последняя запись цикла тоже ссылается на строку отображения
+                previous = None
+                entry = None
+
+                reused = total_files - len(changed_files)
+                if reused:
+                    self._emit_progress(int(100 * reused / total_files))
+
+                features_iter = self._iter_features(changed_files)
+
+                # Обрабатываем новые и измененные изображения
+                for i, (img_path, features) in enumerate(features_iter, start=reused):
+                    # Проверяем флаг остановки
+                    with QMutexLocker(self.mutex):
+                        if not self.running:
+                            writer.abort()
+                            if self.cancelled:
+                                self.index_failed.emit("Индексация была отменена")
+                            return
+
+                    # Если признаки успешно извлечены, добавляем в индекс
                     if features is not None:
-                        features_dict[img_path] = features
-
-                except Exception as e:
-                    # Пропускаем файлы с ошибками
-                    print(f"Ошибка при обработке {img_path}: {e}")
-
-                # Обновляем прогресс
-                progress = int(100 * (i + 1) / total_files)
-                self.progress_update.emit(progress)
-
-            # Сохраняем индекс в файл
-            with open(self.output_path, 'wb') as f:
-                pickle.dump({
-                    'extractor_name': self.extractor.name,
-                    'features': features_dict,
-                    'timestamp': time.time()
-                }, f)
+                        writer.add(img_path, features, file_stats[img_path])
+
+                    # Обновляем прогресс
+                    progress = int(100 * (i + 1) / total_files)
+                    self._emit_progress(progress)
+
+                # Сохраняем индекс в файл. Загруженные для поиска версии индекса
+                # держат его файлы отображенными в память
+                release_shared_index(self.output_path)
+                writer.finalize()
+
+                if self.extractor.persistent_search_index:
+                    self._save_search_index()
+
+            except Exception:
+                writer.abort()
+                raise
+
+            finally:
+                # Отменяет еще не выполненные задачи пула процессов
+                if features_iter is not None:
+                    features_iter.close()
 
             # Отправляем сигнал о завершении
             self.index_completed.emit(self.output_path)
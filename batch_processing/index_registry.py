@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Реестр существующих индексов в папках с изображениями.
+
+Список файлов индекса кэшируется по времени изменения папки .index:
+добавление или замена файла индекса меняет его, поэтому повторные
+обращения к той же папке не перечитывают ее содержимое.
+Реестр можно использовать из нескольких потоков.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from feature_extractors import AVAILABLE_EXTRACTORS
+from batch_processing.index_storage import (get_index_path, INDEX_DIR_NAME,
+                                            INDEX_FILE_PREFIX, INDEX_FILE_SUFFIX)
+
+# Имя файла индекса однозначно определяется экстрактором,
+# поэтому соответствие строится один раз при импорте
+INDEX_FILE_EXTRACTORS = {
+    os.path.basename(get_index_path("", ext.name)): ext
+    for ext in AVAILABLE_EXTRACTORS
+}
+
+
+class IndexRegistry:
+    """
+    Кэш списков индексов по папкам с изображениями.
+    """
+
+    def __init__(self, max_folders=32):
+        """
+        Инициализация реестра.
+
+        Args:
+            max_folders (int, optional): Количество папок, списки индексов которых хранятся в кэше
+        """
+        self.max_folders = max_folders
+        self.cache = OrderedDict()  # {папка: (mtime_ns папки .index, список индексов)}
+        self.lock = threading.Lock()
+
+    def get(self, folder_path):
+        """
+        Список индексов папки.
+
+        Args:
+            folder_path (str): Путь к папке с изображениями
+
+        Returns:
+            list: Словари с ключами 'path', 'name', 'extractor', 'file' и 'mtime_ns'
+        """
+        index_dir = os.path.join(folder_path, INDEX_DIR_NAME)
+
+        try:
+            dir_mtime = os.stat(index_dir).st_mtime_ns
+        except OSError:
+            with self.lock:
+                self.cache.pop(folder_path, None)
+            return []
+
+        with self.lock:
+            cached = self.cache.get(folder_path)
+            if cached is not None and cached[0] == dir_mtime:
+                self.cache.move_to_end(folder_path)
+                return cached[1]
+
+        # Папка читается без блокировки, чтобы не задерживать обращения к другим папкам
+        indexes = self._scan(index_dir)
+
+        with self.lock:
+            self.cache[folder_path] = (dir_mtime, indexes)
+            self.cache.move_to_end(folder_path)
+            while len(self.cache) > self.max_folders:
+                self.cache.popitem(last=False)
+
+        return indexes
+
+    def find(self, folder_path, extractor):
+        """
+        Поиск индекса папки для экстрактора.
+
+        Args:
+            folder_path (str): Путь к папке с изображениями
+            extractor: Экстрактор признаков
+
+        Returns:
+            dict: Описание индекса или None, если индекса нет
+        """
+        for index in self.get(folder_path):
+            if index['extractor'].name == extractor.name:
+                return index
+
+        return None
+
+    @staticmethod
+    def _scan(index_dir):
+        """
+        Чтение списка индексов из папки .index.
+
+        Args:
+            index_dir (str): Путь к папке .index
+
+        Returns:
+            list: Описания найденных индексов
+        """
+        indexes = []
+
+        try:
+            entries = os.scandir(index_dir)
+        except OSError:
+            return indexes
+
+        with entries:
+            for entry in entries:
+                # Находим соответствующий экстрактор
+                matching_extractor = INDEX_FILE_EXTRACTORS.get(entry.name)
+                if matching_extractor is None or not entry.is_file():
+                    continue
+
+                # Извлекаем имя модели из имени файла
+                model_name = entry.name[len(INDEX_FILE_PREFIX):-len(INDEX_FILE_SUFFIX)].replace("_", " ")
+
+                indexes.append({
+                    'path': entry.path,
+                    'name': model_name,
+                    'extractor': matching_extractor,
+                    'file': entry.name,
+                    'mtime_ns': entry.stat().st_mtime_ns
+                })
+
+        return indexes
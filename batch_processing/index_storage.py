@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль для сохранения и загрузки индекса признаков изображений.
+
+Индекс состоит из JSON-файла с метаданными и списком путей к изображениям
+и файлов с признаками рядом с ним: матрицы .npy для векторных признаков,
+набора массивов .npy с общими смещениями для признаков из массивов переменной
+длины или потока записей pickle для признаков произвольной структуры.
+Записи об удаленных файлах могут помечаться в метаданных без перезаписи признаков.
+"""
+
+import os
+import io
+import json
+import time
+import pickle
+import numpy as np
+
+from utils.file_utils import INDEX_DIR_NAME
+
+# Пытаемся импортировать FAISS для приближенного поиска ближайших соседей
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+INDEX_FILE_PREFIX = "image_index_"
+INDEX_FILE_SUFFIX = ".json"
+
+# Ширина поиска по графу HNSW (FAISS использует не меньше, чем запрошено результатов)
+ANN_EF_SEARCH = 128
+
+# Место под заголовок .npy в начале файла матрицы. Заголовок двумерного
+# массива простого типа всегда выравнивается numpy ровно до 128 байт
+NPY_HEADER_SIZE = 128
+
+# Размер буфера потока записей pickle: записи небольшие, и с буфером
+# по умолчанию (8 КБ) чтение большого индекса требует множества системных вызовов
+PICKLE_BUFFER_SIZE = 4 * 1024 * 1024
+
+FORMAT_MATRIX = "matrix"
+FORMAT_RAGGED = "ragged"
+FORMAT_PICKLE = "pickle"
+
+
+def get_index_path(folder_path, extractor_name):
+    """
+    Формирует путь к файлу индекса для папки и экстрактора.
+
+    Args:
+        folder_path (str): Путь к папке с изображениями
+        extractor_name (str): Название экстрактора
+
+    Returns:
+        str: Путь к JSON-файлу индекса
+    """
+    name = extractor_name.replace(" ", "_").lower()
+    return os.path.join(folder_path, INDEX_DIR_NAME, f"{INDEX_FILE_PREFIX}{name}{INDEX_FILE_SUFFIX}")
+
+
+def build_ann_index(features_matrix, chunk_size=8192):
+    """
+    Построение графа HNSW по нормализованным векторам для поиска по косинусному сходству.
+
+    Args:
+        features_matrix (numpy.ndarray): Матрица признаков (N, D)
+        chunk_size (int): Количество строк, добавляемых за один проход
+
+    Returns:
+        faiss.Index: Индекс FAISS со скалярным произведением в качестве метрики
+    """
+    ann_index = faiss.IndexHNSWFlat(features_matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+
+    for start in range(0, len(features_matrix), chunk_size):
+        vectors = features_matrix[start:start + chunk_size].astype(np.float32)
+        faiss.normalize_L2(vectors)
+        ann_index.add(vectors)
+
+    return ann_index
+
+
+class IndexWriter:
+    """
+    Инкрементальная запись индекса на диск.
+
+    Векторы признаков записываются построчно в отображенный в память файл .npy,
+    который удваивается при заполнении. Признаки из нескольких массивов с общим
+    числом строк (например, ключевые точки и их дескрипторы) дописываются
+    в отдельный файл .npy для каждого массива, границы изображений хранятся
+    в массиве смещений. Остальные признаки записываются потоком записей pickle.
+    Все файлы пишутся во временные и переименовываются только в finalize,
+    поэтому прерванная индексация не портит существующий индекс.
+    """
+
+    def __init__(self, index_path, extractor_name, vector_features, dtype=np.float32,
+                 build_ann=False, normalized=False, initial_capacity=1024, ragged=False):
+        """
+        Инициализация записи индекса.
+
+        Args:
+            index_path (str): Путь к JSON-файлу индекса
+            extractor_name (str): Название экстрактора
+            vector_features (bool): True, если признаки - векторы фиксированной длины
+            dtype (numpy.dtype, optional): Тип элементов матрицы векторных признаков
+            build_ann (bool, optional): Построить индекс FAISS для приближенного поиска
+            normalized (bool, optional): Признаки нормализованы экстрактором к единичной длине
+            initial_capacity (int, optional): Начальное количество строк матрицы
+            ragged (bool, optional): Признаки - кортежи массивов с общим числом строк
+        """
+        self.index_path = index_path
+        self.extractor_name = extractor_name
+        self.vector_features = vector_features
+        self.ragged = ragged and not vector_features
+        self.dtype = np.dtype(dtype)
+        self.build_ann = build_ann
+        self.normalized = normalized
+        self.initial_capacity = initial_capacity
+
+        base_path = os.path.splitext(index_path)[0]
+        self.ann_path = base_path + ".faiss"
+
+        self.paths = []
+        self.mtimes = []
+        self.sizes = []
+        self.matrix = None
+        self.capacity = 0
+        self.pickle_file = None
+
+        # Файлы массивов и смещения записей для признаков переменной длины
+        self.part_files = []
+        self.part_dtypes = []
+        self.part_shapes = []
+        self.offsets = [0]
+
+        if vector_features:
+            self.features_path = base_path + ".npy"
+        elif self.ragged:
+            self.features_path = base_path + ".offsets.npy"
+        else:
+            self.features_path = base_path + ".pkl"
+            self.pickle_file = open(self.features_path + ".tmp", 'wb', buffering=PICKLE_BUFFER_SIZE)
+
+    def add(self, image_path, features, file_stat=None):
+        """
+        Добавление признаков изображения в индекс.
+
+        Args:
+            image_path (str): Путь к изображению
+            features: Признаки изображения
+            file_stat (tuple, optional): (mtime_ns, размер) файла на момент извлечения признаков
+        """
+        if self.vector_features:
+            vector = np.asarray(features, dtype=self.dtype).reshape(-1)
+
+            if self.matrix is None:
+                self._resize(self.initial_capacity, vector.shape[0])
+            elif len(self.paths) == self.capacity:
+                self._resize(self.capacity * 2, self.matrix.shape[1])
+
+            self.matrix[len(self.paths)] = vector
+        elif self.ragged:
+            self._add_ragged(features)
+        else:
+            pickle.dump(features, self.pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.paths.append(image_path)
+
+        mtime, size = file_stat if file_stat is not None else (None, None)
+        self.mtimes.append(mtime)
+        self.sizes.append(size)
+
+    def _part_path(self, i):
+        """
+        Путь к файлу i-го массива признаков переменной длины.
+
+        Args:
+            i (int): Номер массива в кортеже признаков
+
+        Returns:
+            str: Путь к файлу .npy
+        """
+        return os.path.splitext(self.index_path)[0] + f".part{i}.npy"
+
+    def _add_ragged(self, features):
+        """
+        Дописывание массивов признаков одного изображения в файлы массивов.
+        Отсутствующие массивы (None) записываются как ноль строк. Массивы без строк
+        не задают форму и тип файла: пустые записи загруженного индекса имеют
+        форму (0, 0), если файл массива был пустым.
+
+        Args:
+            features (tuple): Массивы признаков с общим числом строк
+
+        Raises:
+            ValueError: Если массивы имеют разное число строк или другую форму строк
+        """
+        if not self.part_files:
+            self.part_files = [None] * len(features)
+            self.part_dtypes = [None] * len(features)
+            self.part_shapes = [None] * len(features)
+
+        arrays = [None if array is None else np.asarray(array) for array in features]
+        present = [array for array in arrays if array is not None]
+
+        # Проверяем все массивы до записи, чтобы не оставить в файлах часть записи
+        rows = len(present[0]) if present else 0
+        if present and (len(present) != len(arrays) or any(len(array) != rows for array in present)):
+            raise ValueError("Массивы признаков изображения имеют разное число строк")
+
+        if rows == 0:
+            self.offsets.append(self.offsets[-1])
+            return
+
+        for i, array in enumerate(arrays):
+            if self.part_shapes[i] is not None and array.shape[1:] != self.part_shapes[i]:
+                raise ValueError(f"Неожиданная форма массива признаков: {array.shape}")
+
+        for i, array in enumerate(arrays):
+            if self.part_files[i] is None:
+                # Место под заголовок .npy записывается при finalize
+                self.part_files[i] = open(self._part_path(i) + ".tmp", 'wb')
+                self.part_files[i].write(b'\0' * NPY_HEADER_SIZE)
+                self.part_dtypes[i] = array.dtype
+                self.part_shapes[i] = array.shape[1:]
+
+            self.part_files[i].write(np.ascontiguousarray(array, dtype=self.part_dtypes[i]).tobytes())
+
+        self.offsets.append(self.offsets[-1] + rows)
+
+    def _finalize_ragged(self):
+        """
+        Запись заголовков .npy файлов массивов и сохранение смещений записей.
+
+        Returns:
+            list: Имена файлов массивов
+        """
+        part_names = []
+
+        for i, part_file in enumerate(self.part_files):
+            tmp_path = self._part_path(i) + ".tmp"
+
+            if part_file is None:
+                # Массив ни разу не встретился: форма его строк неизвестна,
+                # пустые записи при следующей записи индекса пропускаются
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, np.empty((0, 0), dtype=np.float32))
+            else:
+                part_file.seek(0)
+                part_file.write(self._npy_header(self.part_dtypes[i],
+                                                 (self.offsets[-1],) + self.part_shapes[i]))
+                part_file.close()
+
+            part_names.append(os.path.basename(self._part_path(i)))
+
+        self.part_files = [None] * len(self.part_files)
+
+        with open(self.features_path + ".tmp", 'wb') as f:
+            np.save(f, np.asarray(self.offsets, dtype=np.int64))
+
+        return part_names
+
+    @staticmethod
+    def _npy_header(dtype, shape):
+        """
+        Заголовок .npy фиксированного размера NPY_HEADER_SIZE.
+
+        Args:
+            dtype (numpy.dtype): Тип элементов массива
+            shape (tuple): Форма массива
+
+        Returns:
+            bytes: Заголовок файла
+
+        Raises:
+            ValueError: Если заголовок не совпал по размеру с зарезервированным местом
+        """
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            'fortran_order': False,
+            'shape': shape
+        })
+        if len(header.getvalue()) != NPY_HEADER_SIZE:
+            raise ValueError(f"Неожиданный размер заголовка .npy: {len(header.getvalue())}")
+
+        return header.getvalue()
+
+    def _resize(self, capacity, dim):
+        """
+        Изменение размера файла матрицы и повторное отображение его в память.
+        В начале файла резервируется место под заголовок .npy.
+
+        Args:
+            capacity (int): Новое количество строк
+            dim (int): Размерность векторов
+        """
+        tmp_path = self.features_path + ".tmp"
+
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+
+        with open(tmp_path, 'r+b' if self.capacity else 'wb') as f:
+            f.truncate(NPY_HEADER_SIZE + capacity * dim * self.dtype.itemsize)
+
+        self.matrix = np.memmap(tmp_path, dtype=self.dtype, mode='r+',
+                                offset=NPY_HEADER_SIZE, shape=(capacity, dim))
+        self.capacity = capacity
+
+    def _finalize_matrix(self):
+        """
+        Обрезка файла матрицы до записанных строк и запись заголовка .npy.
+        """
+        tmp_path = self.features_path + ".tmp"
+
+        if self.matrix is None:
+            # Пустой индекс
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.empty((0, 0), dtype=self.dtype))
+            return
+
+        dim = self.matrix.shape[1]
+        self.matrix.flush()
+        self.matrix = None
+
+        header = self._npy_header(self.dtype, (len(self.paths), dim))
+
+        with open(tmp_path, 'r+b') as f:
+            f.truncate(NPY_HEADER_SIZE + len(self.paths) * dim * self.dtype.itemsize)
+            f.seek(0)
+            f.write(header)
+
+    def finalize(self):
+        """
+        Завершение записи: сохранение метаданных и замена старого индекса новым.
+        """
+        part_names = []
+
+        if self.vector_features:
+            self._finalize_matrix()
+            index_format = FORMAT_MATRIX
+        elif self.ragged:
+            part_names = self._finalize_ragged()
+            index_format = FORMAT_RAGGED
+        else:
+            self.pickle_file.close()
+            self.pickle_file = None
+            index_format = FORMAT_PICKLE
+
+        metadata = {
+            'extractor_name': self.extractor_name,
+            'timestamp': time.time(),
+            'format': index_format,
+            'normalized': self.normalized,
+            'features_file': os.path.basename(self.features_path),
+            'count': len(self.paths),
+            'paths': self.paths,
+            'mtimes': self.mtimes,
+            'sizes': self.sizes
+        }
+
+        if self.ragged:
+            metadata['part_files'] = part_names
+
+        build_ann = self.vector_features and self.build_ann and FAISS_AVAILABLE and self.paths
+        if build_ann:
+            matrix = np.load(self.features_path + ".tmp", mmap_mode='r')
+            faiss.write_index(build_ann_index(matrix), self.ann_path + ".tmp")
+            del matrix
+            metadata['ann_file'] = os.path.basename(self.ann_path)
+
+        with open(self.index_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+
+        os.replace(self.features_path + ".tmp", self.features_path)
+        for i in range(len(part_names)):
+            os.replace(self._part_path(i) + ".tmp", self._part_path(i))
+        if build_ann:
+            os.replace(self.ann_path + ".tmp", self.ann_path)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def abort(self):
+        """
+        Отмена записи и удаление временных файлов.
+        """
+        self.matrix = None
+
+        if self.pickle_file is not None:
+            self.pickle_file.close()
+            self.pickle_file = None
+
+        for part_file in self.part_files:
+            if part_file is not None:
+                part_file.close()
+
+        part_paths = [self._part_path(i) for i in range(len(self.part_files))]
+        self.part_files = []
+
+        for path in [self.features_path, self.ann_path, self.index_path] + part_paths:
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+
+def mark_deleted(index_path, deleted):
+    """
+    Помечает записи индекса удаленными. Перезаписываются только метаданные,
+    файлы признаков и номера остальных записей не меняются.
+
+    Args:
+        index_path (str): Путь к JSON-файлу индекса
+        deleted (iterable): Номера удаленных записей
+    """
+    with open(index_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    metadata['deleted'] = sorted(deleted)
+
+    with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False)
+
+    os.replace(index_path + ".tmp", index_path)
+
+
+def index_entry_keys(index_data):
+    """
+    Ключи записей индекса, не зависящие от их номеров: путь к изображению,
+    время изменения и размер файла на момент извлечения признаков.
+    По ключу структуры поиска записи используются повторно после дописывания индекса.
+
+    Args:
+        index_data (dict): Метаданные индекса
+
+    Returns:
+        list: Кортежи (путь, mtime_ns, размер); для индексов без времен изменения
+            mtime_ns и размер равны None
+    """
+    paths = index_data['paths']
+    mtimes = index_data.get('mtimes') or [None] * len(paths)
+    sizes = index_data.get('sizes') or [None] * len(paths)
+    return list(zip(paths, mtimes, sizes))
+
+
+def load_index(index_path, mmap_mode='r'):
+    """
+    Загружает индекс с диска.
+
+    Матрица векторных признаков по умолчанию отображается в память,
+    поэтому операционная система подгружает только используемые страницы.
+
+    Args:
+        index_path (str): Путь к JSON-файлу индекса
+        mmap_mode (str, optional): Режим отображения матрицы в память (None - читать целиком)
+
+    Returns:
+        dict: Метаданные индекса с ключами 'paths', 'features' и, если есть,
+            'ann_index' и 'deleted' (номера удаленных записей)
+    """
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index_data = json.load(f)
+
+    features_path = os.path.join(os.path.dirname(index_path), index_data['features_file'])
+
+    if index_data['format'] == FORMAT_MATRIX:
+        # Пустой файл нельзя отобразить в память
+        index_data['features'] = np.load(features_path, mmap_mode=mmap_mode if index_data['count'] else None)
+
+        # Индекс FAISS загружается, только если библиотека установлена
+        if FAISS_AVAILABLE and 'ann_file' in index_data:
+            ann_path = os.path.join(os.path.dirname(index_path), index_data['ann_file'])
+            index_data['ann_index'] = faiss.read_index(ann_path)
+            faiss.ParameterSpace().set_index_parameter(index_data['ann_index'], 'efSearch', ANN_EF_SEARCH)
+    elif index_data['format'] == FORMAT_RAGGED:
+        # Признаки изображений - срезы общих массивов, данные читаются при обращении
+        offsets = np.load(features_path)
+        index_dir = os.path.dirname(index_path)
+        parts = [
+            np.load(os.path.join(index_dir, name), mmap_mode=mmap_mode if offsets[-1] else None)
+            for name in index_data['part_files']
+        ]
+        index_data['features'] = [
+            tuple(part[start:stop] for part in parts)
+            for start, stop in zip(offsets[:-1], offsets[1:])
+        ]
+    else:
+        # Признаки записаны потоком отдельных записей pickle
+        with open(features_path, 'rb', buffering=PICKLE_BUFFER_SIZE) as f:
+            index_data['features'] = [pickle.load(f) for _ in range(index_data['count'])]
+
+    return index_data
@@ -1,38 +1,24 @@
 # -*- coding: utf-8 -*-
 """
 Пакет с экстракторами признаков для поиска изображений.
+
+Список AVAILABLE_EXTRACTORS создается при первом обращении к нему, а экстракторы
+DeepFace и CNN импортируются только тогда. Дочерний процесс пула, которому
+передается экстрактор SIFT или гистограмм, при импорте пакета не загружает
+PyTorch, DeepFace и веса моделей.
 """
 
+import importlib
+
 from feature_extractors.base_extractor import FeatureExtractor
 from feature_extractors.sift_extractor import SIFTFeatureExtractor
 from feature_extractors.histogram_extractor import ColorHistogramExtractor
 
-# Пытаемся импортировать DeepFace экстрактор
-try:
-    from feature_extractors.deepface_extractor import DeepFaceExtractor
-    DEEPFACE_AVAILABLE = True
-except ImportError:
-    DEEPFACE_AVAILABLE = False
-
-# Пытаемся импортировать CNN экстрактор
-try:
-    from feature_extractors.cnn_extractor import CNNFeatureExtractor
-    CNN_AVAILABLE = True
-except ImportError:
-    CNN_AVAILABLE = False
-
-AVAILABLE_EXTRACTORS = [
-    SIFTFeatureExtractor(),
-    ColorHistogramExtractor()
-]
-
-# Добавляем DeepFace экстрактор, если он доступен
-if DEEPFACE_AVAILABLE:
-    AVAILABLE_EXTRACTORS.append(DeepFaceExtractor())
-
-# Добавляем ResNet50, но убираем VGG16
-if CNN_AVAILABLE:
-    AVAILABLE_EXTRACTORS.append(CNNFeatureExtractor("resnet50"))
+# Модуль пакета, в котором определен каждый необязательный экстрактор
+_OPTIONAL_EXTRACTORS = {
+    'DeepFaceExtractor': 'feature_extractors.deepface_extractor',
+    'CNNFeatureExtractor': 'feature_extractors.cnn_extractor'
+}
 
 __all__ = [
     'FeatureExtractor',
@@ -41,10 +27,70 @@ __all__ = [
     'AVAILABLE_EXTRACTORS'
 ]
 
-# Добавляем DeepFaceExtractor в __all__, если он доступен
-if DEEPFACE_AVAILABLE:
-    __all__.append('DeepFaceExtractor')
 
-# Добавляем CNNFeatureExtractor в __all__, если он доступен
-if CNN_AVAILABLE:
-    __all__.append('CNNFeatureExtractor')
\ No newline at end of file
+def _import_optional(name):
+    """
+    Импорт необязательного экстрактора.
+
+    Args:
+        name (str): Имя класса экстрактора
+
+    Returns:
+        type: Класс экстрактора или None, если его зависимости не установлены
+    """
+    try:
+        return getattr(importlib.import_module(_OPTIONAL_EXTRACTORS[name]), name)
+    except ImportError:
+        return None
+
+
+def _create_extractors():
+    """
+    Создание экстракторов, доступных в интерфейсе.
+
+    Returns:
+        list: Экземпляры экстракторов
+    """
+    extractors = [
+        SIFTFeatureExtractor(),
+        ColorHistogramExtractor()
+    ]
+
+    # Добавляем DeepFace экстрактор, если он доступен
+    deepface_extractor = _import_optional('DeepFaceExtractor')
+    if deepface_extractor is not None:
+        extractors.append(deepface_extractor())
+
+    # Добавляем ResNet50, но убираем VGG16
+    cnn_extractor = _import_optional('CNNFeatureExtractor')
+    if cnn_extractor is not None:
+        extractors.append(cnn_extractor("resnet50"))
+
+    return extractors
+
+
+def __getattr__(name):
+    """
+    Создание списка экстракторов и импорт необязательных экстракторов при первом обращении.
+
+    Args:
+        name (str): Имя атрибута
+
+    Returns:
+        Список AVAILABLE_EXTRACTORS или класс экстрактора
+
+    Raises:
+        AttributeError: Если пакет не экспортирует такое имя или зависимости
+            экстрактора не установлены
+    """
+    if name == 'AVAILABLE_EXTRACTORS':
+        value = _create_extractors()
+    elif name in _OPTIONAL_EXTRACTORS:
+        value = _import_optional(name)
+        if value is None:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
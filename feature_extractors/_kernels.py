@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Скомпилированные Numba ядра для пакетного сравнения признаков.
+Если Numba не установлена, экстракторы используют реализацию на numpy.
+"""
+
+# Пытаемся импортировать Numba
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def histogram_metrics_batch(matrix, query, query_centered, eps, numerator, intersection, chi_square):
+        """
+        Вычисление компонент метрик сравнения гистограмм за один проход по матрице.
+
+        Args:
+            matrix (numpy.ndarray): Матрица гистограмм индекса (N, D)
+            query (numpy.ndarray): Гистограмма запроса (D,)
+            query_centered (numpy.ndarray): Гистограмма запроса за вычетом среднего (D,)
+            eps (float): Порог, ниже которого бин запроса считается нулевым
+            numerator (numpy.ndarray): Выход: числитель корреляции (N,)
+            intersection (numpy.ndarray): Выход: сумма минимумов бинов (N,)
+            chi_square (numpy.ndarray): Выход: хи-квадрат по ненулевым бинам запроса (N,)
+        """
+        for i in prange(matrix.shape[0]):
+            num = 0.0
+            inter = 0.0
+            chi = 0.0
+
+            for j in range(matrix.shape[1]):
+                m = matrix[i, j]
+                q = query[j]
+
+                num += m * query_centered[j]
+                inter += min(m, q)
+
+                if q > eps:
+                    d = q - m
+                    chi += d * d / q
+
+            numerator[i] = num
+            intersection[i] = inter
+            chi_square[i] = chi
+
+    @njit(fastmath=True, cache=True)
+    def lowe_count(dists, ratio_sq):
+        """
+        Подсчет совпадений, прошедших тест Лоу, без промежуточной маски.
+
+        Args:
+            dists (numpy.ndarray): Квадраты расстояний до двух ближайших соседей (N, 2)
+            ratio_sq (float): Квадрат порога отношения расстояний
+
+        Returns:
+            int: Количество хороших совпадений
+        """
+        count = 0
+        for i in range(dists.shape[0]):
+            if dists[i, 0] < ratio_sq * dists[i, 1]:
+                count += 1
+        return count
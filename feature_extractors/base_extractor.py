@@ -3,6 +3,11 @@
 Базовый класс экстрактора признаков для поиска изображений.
 """
 
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
 
 class FeatureExtractor:
     """
@@ -16,6 +21,34 @@ class FeatureExtractor:
         """
         self.name = "Базовый экстрактор"
 
+        # Признаки - вектор фиксированной длины, который можно сложить в матрицу индекса
+        self.vector_features = False
+
+        # Признаки - кортеж массивов с общим переменным числом строк
+        # (например, ключевые точки и дескрипторы), которые хранятся в общих файлах .npy
+        self.ragged_features = False
+
+        # Тип элементов матрицы векторных признаков в файле индекса
+        self.index_dtype = np.float32
+
+        # Векторы сравниваются косинусным сходством (cos + 1) / 2,
+        # поэтому для индекса можно построить граф приближенного поиска
+        self.ann_index = False
+
+        # Векторы признаков нормализуются к единичной длине при извлечении
+        self.normalized_features = False
+
+        # Количество изображений, передаваемых в extract_features_batch за один вызов
+        self.batch_size = 1
+
+        # Извлечение признаков можно распределить по процессам.
+        # Экстрактор и его признаки должны сериализоваться через pickle
+        self.use_process_pool = False
+
+        # Экстрактор строит для индекса структуры поиска, которые сохраняются
+        # на диск после индексации (save_index) и подключаются при загрузке (load_index)
+        self.persistent_search_index = False
+
     def extract_features(self, image_path):
         """
         Извлечение дескрипторов из изображения.
@@ -31,6 +64,35 @@ class FeatureExtractor:
         """
         raise NotImplementedError("Метод должен быть реализован в дочернем классе")
 
+    def init_worker_process(self):
+        """
+        Настройка экстрактора в дочернем процессе пула индексации или поиска.
+        Вызывается один раз при запуске процесса, если use_process_pool включен.
+        """
+        pass
+
+    def extract_features_batch(self, image_paths):
+        """
+        Извлечение дескрипторов из нескольких изображений.
+        По умолчанию вызывает extract_features для каждого изображения.
+
+        Args:
+            image_paths (list): Список путей к изображениям
+
+        Returns:
+            list: Дескрипторы в том же порядке (None для необработанных изображений)
+        """
+        features_list = []
+
+        for image_path in image_paths:
+            try:
+                features_list.append(self.extract_features(image_path))
+            except Exception as e:
+                logger.debug("Ошибка при обработке %s: %s", image_path, e)
+                features_list.append(None)
+
+        return features_list
+
     def compare_features(self, features1, features2):
         """
         Сравнение двух наборов дескрипторов и вычисление меры сходства.
@@ -46,3 +108,72 @@ class FeatureExtractor:
             NotImplementedError: Если метод не реализован в дочернем классе
         """
         raise NotImplementedError("Метод должен быть реализован в дочернем классе")
+
+    def prepare_index(self, features, normalized=False):
+        """
+        Подготовка признаков индекса к пакетному сравнению.
+        Вызывается один раз при загрузке индекса.
+
+        Args:
+            features: Матрица (N, D) типа index_dtype для векторных признаков
+                или список признаков для остальных экстракторов
+            normalized (bool, optional): Признаки индекса уже нормализованы при извлечении
+
+        Returns:
+            Подготовленные данные, которые передаются в compare_features_batch
+        """
+        return features
+
+    def save_index(self, prepared_index, index_path, entry_keys=None, reuse=True):
+        """
+        Сохранение структур поиска подготовленного индекса рядом с файлом индекса.
+        Вызывается после индексации, если persistent_search_index включен.
+
+        Args:
+            prepared_index: Результат prepare_index
+            index_path (str): Путь к JSON-файлу индекса
+            entry_keys (list, optional): Ключи записей (index_entry_keys)
+            reuse (bool, optional): Можно ли использовать структуры прошлой версии индекса
+                (False при полной переиндексации)
+        """
+        pass
+
+    def load_index(self, prepared_index, index_path, entry_keys=None):
+        """
+        Подключение сохраненных структур поиска к подготовленному индексу.
+        Вызывается при загрузке индекса сразу после prepare_index.
+
+        Args:
+            prepared_index: Результат prepare_index
+            index_path (str): Путь к JSON-файлу индекса
+            entry_keys (list, optional): Ключи записей (index_entry_keys)
+        """
+        pass
+
+    def compare_features_batch(self, query_features, prepared_index):
+        """
+        Сравнение признаков запроса со всеми признаками индекса сразу.
+        По умолчанию вызывает compare_features для каждой записи индекса.
+
+        Args:
+            query_features: Признаки запроса
+            prepared_index: Результат prepare_index
+
+        Returns:
+            numpy.ndarray: Вектор значений сходства длины N
+        """
+        similarities = np.zeros(len(prepared_index), dtype=np.float32)
+        errors = 0
+
+        for i, features in enumerate(prepared_index):
+            try:
+                similarities[i] = self.compare_features(query_features, features)
+            except Exception as e:
+                # Ошибки считаются и выводятся одним сообщением после цикла
+                errors += 1
+                logger.debug("Ошибка при сравнении признаков записи %d: %s", i, e)
+
+        if errors:
+            logger.warning("Не удалось сравнить признаки для %d записей индекса", errors)
+
+        return similarities
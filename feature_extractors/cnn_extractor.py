@@ -3,8 +3,10 @@
 Экстрактор признаков на основе предобученных CNN моделей (ResNet, VGG и др.)
 """
 
+import os
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from feature_extractors.base_extractor import FeatureExtractor
 
 try:
@@ -13,10 +15,27 @@ try:
     import torchvision.transforms as transforms
     from PIL import Image
 
+    # inference_mode (PyTorch 1.9+) отключает не только градиенты,
+    # но и учет версий тензоров, поэтому дешевле no_grad
+    inference_mode = getattr(torch, 'inference_mode', torch.no_grad)
+
+    # torch.autocast появился в PyTorch 1.10, в 1.9 смешанная точность
+    # на GPU включается через torch.cuda.amp.autocast
+    if hasattr(torch, 'autocast'):
+        def cuda_autocast():
+            return torch.autocast(device_type="cuda")
+    else:
+        cuda_autocast = torch.cuda.amp.autocast
+
     TORCH_AVAILABLE = True
 except ImportError:
     TORCH_AVAILABLE = False
 
+# Количество строк int8, переводимых в float32 перед умножением на запрос.
+# Буфер 256 x 2048 x 4 байта (2 МБ) остается в кэше процессора между
+# заполнением и чтением, поэтому матрица читается из памяти один раз
+COMPARE_TILE_ROWS = 256
+
 
 class CNNFeatureExtractor(FeatureExtractor):
     """
@@ -37,6 +56,26 @@ class CNNFeatureExtractor(FeatureExtractor):
         self.model_name = model_name
         self.name = f"CNN ({model_name})"
         self.initialized = False
+        self.vector_features = True
+
+        # Векторы ResNet хранятся в индексе в половинной точности
+        self.index_dtype = np.float16
+        self.ann_index = True
+        self.normalized_features = True
+
+        # Квантованная матрица поиска сохраняется рядом с индексом,
+        # чтобы не пересчитывать ее при каждой загрузке
+        self.persistent_search_index = True
+
+        # Изображения обрабатываются пакетами за один прямой проход сети
+        self.batch_size = 32
+
+        # Пул потоков для параллельного декодирования изображений пакета
+        self.loader_pool = None
+
+        # Закрепленный буфер пакета и CUDA-поток создаются при первом пакетном проходе на GPU
+        self.pinned_buffer = None
+        self.cuda_stream = None
 
         if not TORCH_AVAILABLE:
             print("Библиотеки PyTorch не установлены.")
@@ -46,8 +85,15 @@ class CNNFeatureExtractor(FeatureExtractor):
         try:
             # Загружаем предобученную модель
             if model_name == "resnet50":
-                self.model = models.resnet50(pretrained=True)
+                self.model = self._load_resnet50()
                 self.output_size = 2048
+            else:
+                print(f"Неподдерживаемая модель CNN: {model_name}")
+                return
+
+            # Убираем классификационный слой: выход сети - эмбеддинг после глобального пулинга
+            self.model.fc = torch.nn.Identity()
+            self.feature_extractor = self.model
 
             # Подготовка обработки изображений
             self.transform = transforms.Compose([
@@ -72,6 +118,20 @@ class CNNFeatureExtractor(FeatureExtractor):
         except Exception as e:
             print(f"Ошибка при инициализации CNN экстрактора: {e}")
 
+    @staticmethod
+    def _load_resnet50():
+        """
+        Загрузка предобученной ResNet50 с учетом версии torchvision.
+
+        Returns:
+            torch.nn.Module: Модель ResNet50 с весами ImageNet
+        """
+        # Начиная с torchvision 0.13 веса задаются параметром weights
+        if hasattr(models, "ResNet50_Weights"):
+            return models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
+
+        return models.resnet50(pretrained=True)
+
     def extract_features(self, image_path):
         """
         Извлечение глубоких признаков из изображения.
@@ -91,7 +151,7 @@ class CNNFeatureExtractor(FeatureExtractor):
             img_tensor = self.transform(img).unsqueeze(0).to(self.device)
 
             # Извлекаем признаки (без вычисления градиентов)
-            with torch.no_grad():
+            with inference_mode():
                 features = self.feature_extractor(img_tensor)
 
             # Преобразуем тензор в плоский массив numpy
@@ -101,13 +161,129 @@ class CNNFeatureExtractor(FeatureExtractor):
             if features.ndim > 1:
                 features = features.reshape(-1)
 
-            # Приводим к типу float32 для уменьшения размера и единообразия
-            return features.astype(np.float32)
+            # Приводим к типу float32 и единичной длине
+            return self._normalize(features.astype(np.float32))
 
         except Exception as e:
             print(f"Ошибка при извлечении CNN признаков из {image_path}: {e}")
             return None
 
+    @staticmethod
+    def _normalize(features):
+        """
+        Нормализация вектора признаков к единичной длине.
+
+        Args:
+            features (numpy.ndarray): Вектор признаков
+
+        Returns:
+            numpy.ndarray: Нормализованный вектор (нулевой вектор не изменяется)
+        """
+        norm = np.linalg.norm(features)
+        return features / norm if norm > 0 else features
+
+    def _load_tensor(self, image_path):
+        """
+        Загрузка изображения и преобразование его во входной тензор сети.
+
+        Args:
+            image_path (str): Путь к изображению
+
+        Returns:
+            torch.Tensor: Тензор (3, 224, 224) или None, если не удалось загрузить
+        """
+        try:
+            img = Image.open(image_path).convert('RGB')
+            return self.transform(img)
+        except Exception as e:
+            print(f"Ошибка при извлечении CNN признаков из {image_path}: {e}")
+            return None
+
+    def _forward_cuda(self, tensors):
+        """
+        Прямой проход пакета на GPU через закрепленный буфер и отдельный CUDA-поток.
+
+        Пакет копируется в постоянный закрепленный (pinned) буфер float16,
+        передается на устройство асинхронно и обрабатывается в смешанной точности.
+
+        Args:
+            tensors (list): Список входных тензоров (3, 224, 224)
+
+        Returns:
+            torch.Tensor: Признаки пакета
+        """
+        if self.pinned_buffer is None or len(self.pinned_buffer) < len(tensors):
+            self.pinned_buffer = torch.empty(
+                (max(self.batch_size, len(tensors)),) + tuple(tensors[0].shape),
+                dtype=torch.float16,
+                pin_memory=True
+            )
+            self.cuda_stream = torch.cuda.Stream(device=self.device)
+
+        host_batch = self.pinned_buffer[:len(tensors)]
+        for i, tensor in enumerate(tensors):
+            host_batch[i].copy_(tensor)
+
+        with torch.cuda.stream(self.cuda_stream):
+            batch = host_batch.to(self.device, non_blocking=True)
+
+            # Извлекаем признаки (без вычисления градиентов) в смешанной точности
+            with inference_mode(), cuda_autocast():
+                features = self.feature_extractor(batch)
+
+        # Буфер можно переиспользовать только после завершения копирования и вычислений
+        self.cuda_stream.synchronize()
+
+        return features
+
+    def extract_features_batch(self, image_paths):
+        """
+        Извлечение глубоких признаков из пакета изображений за один прямой проход.
+
+        Args:
+            image_paths (list): Список путей к изображениям
+
+        Returns:
+            list: Векторы признаков в том же порядке (None для необработанных изображений)
+        """
+        features_list = [None] * len(image_paths)
+
+        if not self.initialized:
+            return features_list
+
+        # Декодируем и преобразуем изображения параллельно: PIL освобождает GIL при декодировании
+        if self.loader_pool is None:
+            self.loader_pool = ThreadPoolExecutor(max_workers=4)
+
+        tensors = []
+        positions = []
+        for i, tensor in enumerate(self.loader_pool.map(self._load_tensor, image_paths)):
+            if tensor is not None:
+                tensors.append(tensor)
+                positions.append(i)
+
+        if not tensors:
+            return features_list
+
+        try:
+            if self.device.type == "cuda":
+                features = self._forward_cuda(tensors)
+            else:
+                # Извлекаем признаки (без вычисления градиентов)
+                with inference_mode():
+                    features = self.feature_extractor(torch.stack(tensors))
+
+            features = features.reshape(len(tensors), -1).float().cpu().numpy()
+
+        except Exception as e:
+            print(f"Ошибка при пакетном извлечении CNN признаков: {e}")
+            return features_list
+
+        for i, row in zip(positions, features):
+            features_list[i] = self._normalize(row)
+
+        return features_list
+
     def compare_features(self, features1, features2):
         """
         Сравнение векторов признаков с использованием косинусного сходства.
@@ -136,15 +312,8 @@ class CNNFeatureExtractor(FeatureExtractor):
                     f"Предупреждение: несовпадающие размерности векторов признаков: {features1.shape} и {features2.shape}")
                 return 0.1  # Низкое сходство для несовместимых векторов
 
-            # Вычисляем косинусное сходство
-            dot_product = np.dot(features1, features2)
-            norm1 = np.linalg.norm(features1)
-            norm2 = np.linalg.norm(features2)
-
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
-
-            cosine_similarity = dot_product / (norm1 * norm2)
+            # Векторы нормализованы при извлечении, поэтому косинусное сходство - скалярное произведение
+            cosine_similarity = np.dot(features1, features2)
 
             # Преобразуем в диапазон [0, 1]
             similarity = (cosine_similarity + 1) / 2
@@ -153,4 +322,187 @@ class CNNFeatureExtractor(FeatureExtractor):
 
         except Exception as e:
             print(f"Ошибка при сравнении CNN признаков: {e}")
-            return 0.0
\ No newline at end of file
+            return 0.0
+
+    def prepare_index(self, features_matrix, normalized=False, chunk_size=8192):
+        """
+        Подготовка матрицы индекса, чтобы косинусное сходство сводилось
+        к одному матрично-векторному произведению.
+
+        Для поиска строки квантуются в int8 с собственным масштабом: из памяти
+        читается 1 байт на компоненту вместо 2 у float16 в файле индекса.
+        Квантованная матрица подключается из файлов load_index, а если их нет,
+        строится при первом сравнении, поэтому загрузка индекса не читает
+        матрицу признаков целиком.
+
+        Args:
+            features_matrix (numpy.ndarray): Матрица признаков (N, D)
+            normalized (bool, optional): Строки матрицы уже имеют единичную длину
+            chunk_size (int): Количество строк, квантуемых за один проход
+
+        Returns:
+            dict: Матрица признаков и место для квантованной матрицы и масштабов ее строк
+        """
+        return {
+            'features': features_matrix,
+            'normalized': normalized,
+            'matrix': None,
+            'scale': None,
+            'chunk_size': chunk_size
+        }
+
+    @staticmethod
+    def _quantize(prepared_index):
+        """
+        Квантование матрицы признаков в int8, если оно еще не выполнено.
+
+        Наибольшая по модулю компонента строки переходит в 127. В масштаб строки
+        сразу входит обратная норма, поэтому индексы, созданные до нормализации
+        векторов при извлечении, не требуют отдельного прохода при сравнении.
+
+        Args:
+            prepared_index (dict): Результат prepare_index
+
+        Returns:
+            dict: Тот же prepared_index с заполненными 'matrix' и 'scale'
+        """
+        if prepared_index['matrix'] is not None:
+            return prepared_index
+
+        features_matrix = prepared_index['features']
+        chunk_size = prepared_index['chunk_size']
+
+        quantized = np.empty(features_matrix.shape, dtype=np.int8)
+        scales = np.empty(len(features_matrix), dtype=np.float32)
+
+        for start in range(0, len(features_matrix), chunk_size):
+            chunk = features_matrix[start:start + chunk_size].astype(np.float32)
+            end = start + len(chunk)
+
+            row_max = np.abs(chunk).max(axis=1)
+            row_max[row_max == 0] = 1.0
+            scales[start:end] = row_max / 127.0
+
+            if not prepared_index['normalized']:
+                norms = np.linalg.norm(chunk, axis=1)
+                norms[norms == 0] = 1.0
+                scales[start:end] /= norms
+
+            chunk *= (127.0 / row_max)[:, None]
+            np.rint(chunk, out=chunk)
+            quantized[start:end] = chunk
+
+        prepared_index['scale'] = scales
+        prepared_index['matrix'] = quantized
+        return prepared_index
+
+    @staticmethod
+    def _quantized_paths(index_path):
+        """
+        Пути к файлам квантованной матрицы и масштабов ее строк.
+
+        Args:
+            index_path (str): Путь к JSON-файлу индекса
+
+        Returns:
+            tuple: (путь к матрице int8, путь к масштабам)
+        """
+        base_path = os.path.splitext(index_path)[0]
+        return base_path + ".int8.npy", base_path + ".scale.npy"
+
+    def save_index(self, prepared_index, index_path, entry_keys=None, reuse=True):
+        """
+        Квантование матрицы признаков и сохранение результата рядом с индексом.
+
+        Args:
+            prepared_index (dict): Результат prepare_index
+            index_path (str): Путь к JSON-файлу индекса
+            entry_keys (list, optional): Не используется: матрица сохраняется целиком
+            reuse (bool, optional): Не используется: матрица квантуется заново
+        """
+        self._quantize(prepared_index)
+
+        # Масштабы записываются последними: по их времени проверяется актуальность файлов
+        for path, array in zip(self._quantized_paths(index_path),
+                               (prepared_index['matrix'], prepared_index['scale'])):
+            with open(path + ".tmp", 'wb') as f:
+                np.save(f, array)
+            os.replace(path + ".tmp", path)
+
+    def load_index(self, prepared_index, index_path, entry_keys=None):
+        """
+        Подключение сохраненной квантованной матрицы к подготовленному индексу.
+        Матрица отображается в память. Файлы, записанные раньше матрицы
+        признаков, относятся к старой версии индекса и не используются.
+
+        Args:
+            prepared_index (dict): Результат prepare_index
+            index_path (str): Путь к JSON-файлу индекса
+            entry_keys (list, optional): Не используется: матрица сохраняется целиком
+        """
+        matrix_path, scale_path = self._quantized_paths(index_path)
+        features_path = os.path.splitext(index_path)[0] + ".npy"
+
+        try:
+            if os.stat(scale_path).st_mtime_ns < os.stat(features_path).st_mtime_ns:
+                return
+        except OSError:
+            return
+
+        features_matrix = prepared_index['features']
+
+        try:
+            scales = np.load(scale_path)
+            # Пустой файл нельзя отобразить в память
+            matrix = np.load(matrix_path, mmap_mode='r' if len(features_matrix) else None)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось загрузить квантованную матрицу {matrix_path}: {e}")
+            return
+
+        if matrix.shape == features_matrix.shape and scales.shape == (len(features_matrix),):
+            prepared_index['scale'] = scales
+            prepared_index['matrix'] = matrix
+
+    def compare_features_batch(self, query_features, prepared_index):
+        """
+        Косинусное сходство запроса со всеми векторами индекса.
+        Строки int8 переводятся в float32 блоками по COMPARE_TILE_ROWS перед умножением,
+        результат умножается на масштабы строк.
+
+        Args:
+            query_features (numpy.ndarray): Вектор признаков запроса
+            prepared_index (dict): Результат prepare_index
+
+        Returns:
+            numpy.ndarray: Вектор значений сходства в диапазоне [0, 1]
+        """
+        prepared_index = self._quantize(prepared_index)
+        matrix = prepared_index['matrix']
+
+        query = np.asarray(query_features, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+
+        if norm == 0:
+            return np.zeros(len(matrix), dtype=np.float32)
+
+        query = np.ascontiguousarray(query / norm, dtype=np.float32)
+
+        # Блоки int8 переводятся в один и тот же буфер float32,
+        # а np.dot с out пишет результат GEMV сразу в выходной вектор
+        similarities = np.empty(len(matrix), dtype=np.float32)
+        tile = np.empty((min(COMPARE_TILE_ROWS, len(matrix)), matrix.shape[1]), dtype=np.float32)
+
+        for start in range(0, len(matrix), COMPARE_TILE_ROWS):
+            count = min(COMPARE_TILE_ROWS, len(matrix) - start)
+            np.copyto(tile[:count], matrix[start:start + count])
+            np.dot(tile[:count], query, out=similarities[start:start + count])
+
+        similarities *= prepared_index['scale']
+
+        # Преобразуем в диапазон [0, 1]; ошибка квантования может
+        # вывести значение за границы на доли процента
+        similarities += 1
+        similarities *= 0.5
+        np.clip(similarities, 0.0, 1.0, out=similarities)
+
+        return similarities
\ No newline at end of file
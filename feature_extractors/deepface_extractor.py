@@ -26,6 +26,9 @@ class DeepFaceExtractor(FeatureExtractor):
         """
         super().__init__()
 
+        # Дескрипторы лиц нормализуются при извлечении
+        self.normalized_features = True
+
         # Инициализация необходимых модулей
         try:
             from deepface import DeepFace
@@ -70,12 +73,12 @@ class DeepFaceExtractor(FeatureExtractor):
                 if len(result) > 0:
                     # Извлекаем все дескрипторы
                     embeddings = [np.array(item["embedding"]) for item in result]
-                    return np.array(embeddings)
+                    return self._normalize_faces(np.array(embeddings))[0]
                 else:
                     return np.array([])
             else:
                 # Один дескриптор, оформляем его в список
-                return np.array([np.array(result["embedding"])])
+                return self._normalize_faces(np.array([np.array(result["embedding"])]))[0]
 
         except Exception as e:
             print(f"Ошибка при обработке изображения {image_path}: {e}")
@@ -97,27 +100,105 @@ class DeepFaceExtractor(FeatureExtractor):
             return 0.0
 
         try:
-            # Сравниваем каждое лицо в features1 с каждым лицом в features2
-            best_similarity = 0.0
-
-            for face1 in features1:
-                for face2 in features2:
-                    # Вычисляем косинусное сходство
-                    dot_product = np.dot(face1, face2)
-                    norm_product = np.linalg.norm(face1) * np.linalg.norm(face2)
+            # Сравниваем все лица features1 со всеми лицами features2 одним умножением матриц
+            faces1, nonzero1 = self._normalize_faces(np.atleast_2d(features1), normalized=True)
+            faces2, nonzero2 = self._normalize_faces(np.atleast_2d(features2), normalized=True)
 
-                    if norm_product > 0:
-                        cosine_similarity = dot_product / norm_product
-                        # Переводим в диапазон [0, 1]
-                        similarity = (cosine_similarity + 1) / 2
-                    else:
-                        similarity = 0.0
+            # Дескрипторы с нулевой нормой дают нулевое сходство
+            faces1 = faces1[nonzero1]
+            faces2 = faces2[nonzero2]
+            if len(faces1) == 0 or len(faces2) == 0:
+                return 0.0
 
-                    # Сохраняем лучший результат
-                    best_similarity = max(best_similarity, similarity)
+            # Лучшее косинусное сходство, переведенное в диапазон [0, 1]
+            best_similarity = ((faces1 @ faces2.T).max() + 1) / 2
 
-            return best_similarity
+            return float(best_similarity)
 
         except Exception as e:
             print(f"Ошибка при сравнении дескрипторов лиц: {e}")
-            return 0.0
\ No newline at end of file
+            return 0.0
+
+    @staticmethod
+    def _normalize_faces(faces, normalized=False):
+        """
+        Нормализация дескрипторов лиц к единичной длине.
+
+        Args:
+            faces (numpy.ndarray): Матрица дескрипторов лиц (n, D)
+            normalized (bool, optional): Дескрипторы уже нормализованы, нужна только маска
+
+        Returns:
+            tuple: (нормализованная матрица float32, маска дескрипторов с ненулевой нормой)
+        """
+        faces = np.asarray(faces, dtype=np.float32)
+        if normalized:
+            return faces, faces.any(axis=1)
+
+        norms = np.linalg.norm(faces, axis=1)
+        nonzero = norms > 0
+        faces = faces / np.where(nonzero, norms, 1.0)[:, None]
+        return faces, nonzero
+
+    def prepare_index(self, features, normalized=False):
+        """
+        Объединение дескрипторов лиц всех изображений индекса в одну
+        нормализованную матрицу, чтобы сравнение сводилось к одному умножению.
+
+        Args:
+            features (list): Список массивов дескрипторов лиц (n_i, D)
+            normalized (bool, optional): Дескрипторы уже нормализованы при извлечении
+
+        Returns:
+            dict: Матрица лиц, маска ненулевых дескрипторов и начало лиц каждого изображения
+        """
+        counts = np.array([len(f) for f in features], dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+        faces_list = [np.asarray(f, dtype=np.float32) for f in features if len(f) > 0]
+        if faces_list:
+            faces, nonzero = self._normalize_faces(np.concatenate(faces_list), normalized)
+        else:
+            faces, nonzero = np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=bool)
+
+        return {
+            'faces': faces,
+            'nonzero': nonzero,
+            'counts': counts,
+            'starts': starts
+        }
+
+    def compare_features_batch(self, query_features, prepared_index):
+        """
+        Сравнение лиц запроса с лицами всех изображений индекса.
+        Результат совпадает с compare_features: лучшее сходство среди всех пар лиц.
+
+        Args:
+            query_features (numpy.ndarray): Дескрипторы лиц запроса (n, D)
+            prepared_index (dict): Результат prepare_index
+
+        Returns:
+            numpy.ndarray: Вектор значений сходства длины N
+        """
+        counts = prepared_index['counts']
+        similarities = np.zeros(len(counts), dtype=np.float32)
+
+        faces = prepared_index['faces']
+        if not self.initialized or query_features is None or len(query_features) == 0 or len(faces) == 0:
+            return similarities
+
+        query_faces, query_nonzero = self._normalize_faces(query_features)
+        query_faces = query_faces[query_nonzero]
+        if len(query_faces) == 0:
+            return similarities
+
+        # Лучшее косинусное сходство каждого лица индекса с лицами запроса
+        face_best = (faces @ query_faces.T).max(axis=1)
+        face_best = (face_best + 1) / 2
+        face_best[~prepared_index['nonzero']] = 0.0
+
+        # Максимум по лицам каждого изображения
+        has_faces = counts > 0
+        similarities[has_faces] = np.maximum.reduceat(face_best, prepared_index['starts'][has_faces])
+
+        return similarities
\ No newline at end of file
@@ -7,6 +7,10 @@
 import cv2
 import numpy as np
 from feature_extractors.base_extractor import FeatureExtractor
+from feature_extractors._kernels import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from feature_extractors._kernels import histogram_metrics_batch
 
 
 class ColorHistogramExtractor(FeatureExtractor):
@@ -21,11 +25,20 @@ class ColorHistogramExtractor(FeatureExtractor):
         """
         super().__init__()
         self.name = "Цветовая гистограмма"
+        self.vector_features = True
+        self.use_process_pool = True
 
         # Параметры гистограммы
         self.bins = [8, 8, 8]  # Количество бинов для каждого канала (H, S, V)
         self.hist_ranges = [0, 180, 0, 256, 0, 256]  # Диапазоны для каждого канала
 
+    def init_worker_process(self):
+        """
+        Отключение внутренних потоков OpenCV в дочернем процессе:
+        параллелизм обеспечивает сам пул, а лишние потоки только конкурируют за ядра.
+        """
+        cv2.setNumThreads(1)
+
     def extract_features(self, image_path):
         """
         Извлечение цветовых гистограмм из изображения.
@@ -103,6 +116,93 @@ class ColorHistogramExtractor(FeatureExtractor):
             print(f"Ошибка при сравнении цветовых гистограмм: {e}")
             return 0.0
 
+    def prepare_index(self, features_matrix, normalized=False):
+        """
+        Предварительный расчет величин, не зависящих от запроса.
+
+        Args:
+            features_matrix (numpy.ndarray): Матрица гистограмм (N, D) типа float32
+            normalized (bool, optional): Не используется: гистограммы сравниваются без нормализации
+
+        Returns:
+            dict: Матрица гистограмм и норма центрированных строк
+        """
+        dim = features_matrix.shape[1]
+
+        # Норма центрированной строки: sum((M - mu)^2) = sum(M^2) - D * mu^2.
+        # Считается один раз в float64 из-за вычитания близких величин, хранится в float32
+        squares = np.einsum('ij,ij->i', features_matrix, features_matrix, dtype=np.float64)
+        means = features_matrix.mean(axis=1, dtype=np.float64)
+        centered_norm = np.sqrt(np.maximum(squares - dim * means ** 2, 0.0)).astype(np.float32)
+
+        return {
+            'matrix': features_matrix,
+            'centered_norm': centered_norm
+        }
+
+    def compare_features_batch(self, query_features, prepared_index, chunk_size=4096):
+        """
+        Сравнение гистограммы запроса со всеми гистограммами индекса.
+        Метрики вычисляются так же, как cv2.compareHist в compare_features.
+
+        Args:
+            query_features (numpy.ndarray): Гистограмма запроса
+            prepared_index (dict): Результат prepare_index
+            chunk_size (int): Количество строк, обрабатываемых за один проход
+
+        Returns:
+            numpy.ndarray: Вектор значений сходства длины N
+        """
+        matrix = prepared_index['matrix']
+        query = np.asarray(query_features, dtype=np.float32).reshape(-1)
+
+        # Корреляция: sum(Mc * qc) = M @ qc, так как сумма qc равна нулю
+        query_centered = query - query.mean()
+        numerator = np.empty(len(matrix), dtype=np.float32)
+        intersection = np.empty(len(matrix), dtype=np.float32)
+        chi_square = np.empty(len(matrix), dtype=np.float32)
+
+        # Хи-квадрат OpenCV учитывает только ненулевые бины первой гистограммы
+        eps = np.finfo(np.float32).eps
+
+        if NUMBA_AVAILABLE:
+            # Все три метрики за один проход по матрице
+            histogram_metrics_batch(np.asarray(matrix), query, query_centered, eps,
+                                    numerator, intersection, chi_square)
+        else:
+            nonzero = query > eps
+            query_nonzero = query[nonzero]
+            inverse_query = 1.0 / query_nonzero
+
+            # Метрики считаются по блокам строк,
+            # чтобы не создавать временный массив размером со всю матрицу
+            for start in range(0, len(matrix), chunk_size):
+                chunk = matrix[start:start + chunk_size]
+                rows = slice(start, start + len(chunk))
+
+                numerator[rows] = chunk @ query_centered
+                intersection[rows] = np.minimum(chunk, query).sum(axis=1)
+
+                diff = chunk[:, nonzero] - query_nonzero
+                chi_square[rows] = (diff * diff) @ inverse_query
+
+        # 1. Корреляция
+        denominator = prepared_index['centered_norm'] * np.linalg.norm(query_centered)
+        correlation = np.ones(len(matrix), dtype=np.float32)
+        np.divide(numerator, denominator, out=correlation, where=denominator > np.finfo(np.float32).eps)
+        correlation = (correlation + 1) / 2
+
+        # 2. Пересечение и 3. хи-квадрат
+        query_sum = query.sum()
+        intersection = intersection / query_sum if query_sum > 0 else np.zeros_like(intersection)
+        chi_square = np.exp(-chi_square / 10)
+
+        similarities = correlation + intersection
+        similarities += chi_square
+        similarities /= 3
+
+        return similarities
+
     def analyze_dominant_colors(self, hist, hsv_img):
         """
         Анализирует доминирующие цвета на основе гистограммы HSV.
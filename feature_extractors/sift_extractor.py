@@ -4,9 +4,38 @@
 Позволяет находить изображения с похожими объектами вне зависимости от масштаба и поворота.
 """
 
+import os
+import shutil
+import hashlib
+import logging
+import threading
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from feature_extractors.base_extractor import FeatureExtractor
+from feature_extractors._kernels import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from feature_extractors._kernels import lowe_count
+
+logger = logging.getLogger(__name__)
+
+# Алгоритмы построения индекса FLANN
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_KMEANS = 2
+FLANN_INDEX_KDTREE_SINGLE = 4
+
+# Границы количества дескрипторов для автоматического выбора алгоритма FLANN
+FLANN_SINGLE_TREE_MAX = 5000
+FLANN_KDTREE_MAX = 500000
+
+# Порог теста Лоу и его квадрат для сравнения квадратов расстояний L2
+LOWE_RATIO = 0.7
+LOWE_RATIO_SQ = LOWE_RATIO * LOWE_RATIO
+
+# Робастный метод оценки гомографии: MAGSAC++ сходится за меньшее число итераций,
+# чем классический RANSAC (доступен начиная с OpenCV 4.5)
+HOMOGRAPHY_METHOD = getattr(cv2, 'USAC_MAGSAC', cv2.RANSAC)
 
 
 class SIFTFeatureExtractor(FeatureExtractor):
@@ -15,26 +44,102 @@ class SIFTFeatureExtractor(FeatureExtractor):
     Более мощный, чем ORB, и устойчивый к изменениям масштаба и поворота.
     """
 
-    def __init__(self):
+    # Детекторы SIFT, общие для всех экстракторов процесса, по набору параметров
+    _detectors = {}
+    _detectors_lock = threading.Lock()
+
+    def __init__(self, flann_algorithm='auto', max_image_size=None, nfeatures=1000,
+                 contrast_threshold=0.06, edge_threshold=8, flann_checks=32):
         """
         Инициализация экстрактора SIFT с настройками.
+
+        Args:
+            flann_algorithm (str or int, optional): Алгоритм индекса FLANN
+                ('auto' - выбор по количеству дескрипторов изображения)
+            max_image_size (int, optional): Наибольшая сторона изображения перед поиском
+                ключевых точек (None - без уменьшения)
+            nfeatures (int, optional): Максимальное количество ключевых точек
+            contrast_threshold (float, optional): Порог контраста для отбора кандидатов
+            edge_threshold (float, optional): Порог отсечения кандидатов на краях
+            flann_checks (int, optional): Количество проверяемых листьев при поиске FLANN
         """
         super().__init__()
         self.name = "SIFT (объекты и формы)"
 
-        # Проверяем доступность SIFT в OpenCV
-        try:
-            # В OpenCV 4.x SIFT доступен без патентных ограничений
-            self.sift = cv2.SIFT_create(nfeatures=1000)
-        except AttributeError:
-            # Для совместимости со старыми версиями OpenCV
-            self.sift = cv2.xfeatures2d.SIFT_create(nfeatures=1000)
+        # Признаки - массивы numpy, поэтому индексацию можно распределить по процессам
+        self.use_process_pool = True
+
+        # Координаты точек и дескрипторы всех изображений хранятся в двух общих
+        # массивах .npy, которые при поиске отображаются в память
+        self.ragged_features = True
+
+        # Построенные FLANN индексы изображений сохраняются на диск вместе с индексом
+        self.persistent_search_index = True
+
+        # Более строгие пороги, чем по умолчанию в OpenCV (0.04 и 10), отсекают
+        # слабые кандидаты до вычисления ориентаций и дескрипторов
+        self.sift_params = dict(
+            nfeatures=nfeatures,
+            nOctaveLayers=3,
+            contrastThreshold=contrast_threshold,
+            edgeThreshold=edge_threshold,
+            sigma=1.6
+        )
+
+        # Время работы SIFT растет примерно линейно с количеством пикселей
+        self.max_image_size = max_image_size
 
         # FLANN параметры для быстрого поиска
-        FLANN_INDEX_KDTREE = 1
-        self.flann_index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-        self.flann_search_params = dict(checks=50)
-        self.flann = cv2.FlannBasedMatcher(self.flann_index_params, self.flann_search_params)
+        self.flann_algorithm = flann_algorithm
+        self.flann_search_params = dict(checks=flann_checks)
+
+        # Пул потоков для сравнения с изображениями индекса: knnSearch освобождает GIL
+        self.search_workers = os.cpu_count() or 1
+        self.search_pool = None
+
+    def _get_sift(self):
+        """
+        Детектор SIFT с параметрами экстрактора.
+        Создается при первом обращении и используется всеми экстракторами
+        с теми же параметрами, в том числе из разных потоков.
+
+        Returns:
+            cv2.SIFT: Детектор и дескриптор SIFT
+        """
+        key = tuple(sorted(self.sift_params.items()))
+
+        sift = self._detectors.get(key)
+        if sift is None:
+            with self._detectors_lock:
+                sift = self._detectors.get(key)
+                if sift is None:
+                    # Проверяем доступность SIFT в OpenCV
+                    try:
+                        # В OpenCV 4.x SIFT доступен без патентных ограничений
+                        sift = cv2.SIFT_create(**self.sift_params)
+                    except AttributeError:
+                        # Для совместимости со старыми версиями OpenCV
+                        sift = cv2.xfeatures2d.SIFT_create(**self.sift_params)
+                    self._detectors[key] = sift
+
+        return sift
+
+    def __getstate__(self):
+        """
+        Состояние для передачи экстрактора в процессы пула индексации.
+        Пул потоков не сериализуется через pickle и создается заново.
+        Детектор SIFT создается в дочернем процессе при первом обращении.
+        """
+        state = self.__dict__.copy()
+        state['search_pool'] = None
+        return state
+
+    def init_worker_process(self):
+        """
+        Отключение внутренних потоков OpenCV в дочернем процессе:
+        параллелизм обеспечивает сам пул, а лишние потоки только конкурируют за ядра.
+        """
+        cv2.setNumThreads(1)
 
     def extract_features(self, image_path):
         """
@@ -44,25 +149,33 @@ class SIFTFeatureExtractor(FeatureExtractor):
             image_path (str): Путь к изображению
 
         Returns:
-            tuple: (key_points, descriptors) - ключевые точки и их дескрипторы
-            или (None, None) в случае ошибки
+            tuple: (keypoints_xy, descriptors) - координаты ключевых точек (K, 2) float32
+            и их дескрипторы (K, 128) uint8 или (None, None) в случае ошибки
         """
         try:
-            # Загружаем изображение
-            img = cv2.imread(image_path)
-            if img is None:
+            # Загружаем изображение сразу в оттенках серого
+            gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
                 return (None, None)
 
-            # Преобразуем в оттенки серого
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            # При необходимости уменьшаем изображение
+            if self.max_image_size and max(gray.shape) > self.max_image_size:
+                scale = self.max_image_size / max(gray.shape)
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
             # Находим ключевые точки и дескрипторы с помощью SIFT
-            keypoints, descriptors = self.sift.detectAndCompute(gray, None)
+            keypoints, descriptors = self._get_sift().detectAndCompute(gray, None)
 
             if descriptors is None:
                 return (None, None)
 
-            return (keypoints, descriptors)
+            # Вместо объектов cv2.KeyPoint храним только координаты одним массивом,
+            # который OpenCV заполняет сразу, без промежуточных кортежей Python
+            keypoints_xy = np.asarray(cv2.KeyPoint_convert(keypoints), dtype=np.float32).reshape(-1, 2)
+
+            # OpenCV уже округляет компоненты дескриптора SIFT до целых 0..255,
+            # поэтому хранение в uint8 без потерь уменьшает размер в 4 раза
+            return (keypoints_xy, descriptors.astype(np.uint8))
 
         except Exception as e:
             print(f"Ошибка при извлечении SIFT признаков из {image_path}: {e}")
@@ -73,83 +186,413 @@ class SIFTFeatureExtractor(FeatureExtractor):
         Сравнение SIFT дескрипторов с использованием алгоритма ближайших соседей.
 
         Args:
-            features1: (keypoints1, descriptors1) - ключевые точки и дескрипторы первого изображения
-            features2: (keypoints2, descriptors2) - ключевые точки и дескрипторы второго изображения
+            features1: (keypoints_xy1, descriptors1) - ключевые точки и дескрипторы первого изображения
+            features2: (keypoints_xy2, descriptors2) - ключевые точки и дескрипторы второго изображения
 
         Returns:
             float: Значение сходства от 0 до 1, где 1 - полное сходство
         """
         # Проверка на пустые дескрипторы
-        if None in features1 or None in features2:
+        if not self._has_descriptors(features1) or not self._has_descriptors(features2):
             return 0.0
 
         _, des1 = features1
         _, des2 = features2
-
-        if des1 is None or len(des1) == 0 or des2 is None or len(des2) == 0:
-            return 0.0
+        des1 = des1.astype(np.float32)
 
         try:
-            # Находим соответствия между дескрипторами с помощью kNN
-            try:
-                matches = self.flann.knnMatch(des1, des2, k=2)
-            except cv2.error:
-                # Если не удалось найти k=2 соседей, пробуем с k=1
-                matches = self.flann.knnMatch(des1, des2, k=1)
-                good_matches = matches  # В этом случае все совпадения считаются "хорошими"
-                return min(1.0, len(good_matches) / max(len(des1), len(des2)) * 3)
-
-            # Применяем тест Лоу для фильтрации хороших совпадений
-            good_matches = []
-            for match in matches:
-                if len(match) >= 2:
-                    m, n = match
-                    # Совпадение считается хорошим, если расстояние первого соседа
-                    # значительно меньше расстояния до второго соседа
-                    if m.distance < 0.7 * n.distance:
-                        good_matches.append(m)
-                elif len(match) == 1:
-                    # Если найден только один сосед, считаем его хорошим совпадением
-                    good_matches.append(match[0])
-
-            # Вычисляем меру сходства
-            # Масштабируем для получения более интуитивных значений
-            similarity = min(1.0, len(good_matches) / max(len(des1), len(des2)) * 3)
-
-            return similarity
+            flann_index, _ = self._build_flann_index(des2)
+            num_good = self._count_good_matches(flann_index, des1, len(des2))
+            return float(self._scale_similarity(num_good, len(des1), len(des2)))
 
         except Exception as e:
             print(f"Ошибка при сравнении SIFT дескрипторов: {e}")
             return 0.0
 
-    def _filter_matches_with_homography(self, keypoints1, keypoints2, matches, threshold=3.0):
+    def prepare_index(self, features, normalized=False):
+        """
+        Подготовка признаков индекса к пакетному сравнению.
+        Для каждого изображения при первом сравнении строится (или загружается
+        из сохраненных load_index) свой FLANN индекс, который затем используется
+        повторно для всех следующих запросов.
+
+        Args:
+            features (list): Список признаков (keypoints_xy, descriptors)
+            normalized (bool, optional): Не используется: дескрипторы SIFT не нормализуются
+
+        Returns:
+            dict: Признаки индекса и кэш построенных FLANN индексов
+        """
+        return {
+            'features': features,
+            'flann_indexes': [None] * len(features),
+            'flann_dir': None,
+            'entry_keys': None
+        }
+
+    @staticmethod
+    def _flann_dir(index_path):
+        """
+        Путь к папке с сохраненными FLANN индексами изображений.
+
+        Args:
+            index_path (str): Путь к JSON-файлу индекса
+
+        Returns:
+            str: Путь к папке рядом с файлом индекса
+        """
+        return os.path.splitext(index_path)[0] + ".flann"
+
+    def _flann_name(self, descriptors, key=None):
+        """
+        Имя файла сохраненного FLANN индекса записи.
+        Имя составляется из хеша дескрипторов, ключа записи, параметров SIFT и FLANN
+        и версии OpenCV, поэтому файл подходит к записи под любым номером, а после
+        изменения дескрипторов или параметров не используется. Сам FLANN не проверяет,
+        что дерево построено по тем же дескрипторам, по которым оно загружается.
+
+        Args:
+            descriptors (numpy.ndarray): Дескрипторы записи
+            key (tuple, optional): Ключ записи (index_entry_keys)
+
+        Returns:
+            str: Имя файла
+        """
+        digest = hashlib.sha1(repr((
+            key,
+            descriptors.dtype.str,
+            descriptors.shape,
+            sorted(self.sift_params.items()),
+            sorted(self._flann_index_params(len(descriptors)).items()),
+            cv2.__version__
+        )).encode('utf-8'))
+        digest.update(np.ascontiguousarray(descriptors).data)
+        return f"{digest.hexdigest()}.flann"
+
+    def save_index(self, prepared_index, index_path, entry_keys=None, reuse=True):
+        """
+        Построение недостающих FLANN индексов и сохранение всех индексов изображений на диск.
+        Папка записывается во временную и заменяет старую целиком. Файлы записей,
+        которые были в прошлой версии индекса, копируются из нее без построения.
+
+        Args:
+            prepared_index (dict): Результат prepare_index
+            index_path (str): Путь к JSON-файлу индекса
+            entry_keys (list, optional): Ключи записей (index_entry_keys)
+            reuse (bool, optional): Копировать файлы прошлой версии индекса
+                (False при полной переиндексации)
+        """
+        flann_dir = self._flann_dir(index_path)
+        tmp_dir = flann_dir + ".tmp"
+        reuse = reuse and os.path.isdir(flann_dir)
+
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for i, entry in enumerate(prepared_index['features']):
+            if not self._has_descriptors(entry):
+                continue
+
+            name = self._flann_name(entry[1], entry_keys[i] if entry_keys is not None else None)
+            path = os.path.join(tmp_dir, name)
+
+            if reuse and prepared_index['flann_indexes'][i] is None:
+                old_path = os.path.join(flann_dir, name)
+                if os.path.exists(old_path):
+                    shutil.copyfile(old_path, path)
+                    continue
+
+            self._get_flann_index(prepared_index, i).save(path)
+
+        shutil.rmtree(flann_dir, ignore_errors=True)
+        os.replace(tmp_dir, flann_dir)
+
+        prepared_index['flann_dir'] = flann_dir
+        prepared_index['entry_keys'] = entry_keys
+
+    def load_index(self, prepared_index, index_path, entry_keys=None):
+        """
+        Подключение сохраненных FLANN индексов к подготовленному индексу.
+        Индексы загружаются по мере обращения к изображениям: имя файла записи
+        вычисляется по ее дескрипторам только при первом сравнении с ней.
+
+        Args:
+            prepared_index (dict): Результат prepare_index
+            index_path (str): Путь к JSON-файлу индекса
+            entry_keys (list, optional): Ключи записей (index_entry_keys)
+        """
+        flann_dir = self._flann_dir(index_path)
+
+        if os.path.isdir(flann_dir):
+            prepared_index['flann_dir'] = flann_dir
+            prepared_index['entry_keys'] = entry_keys
+
+    def compare_features_batch(self, query_features, prepared_index):
+        """
+        Сравнение признаков запроса со всеми изображениями индекса
+        с использованием закэшированных FLANN индексов.
+
+        Args:
+            query_features: (keypoints_xy, descriptors) изображения запроса
+            prepared_index (dict): Результат prepare_index
+
+        Returns:
+            numpy.ndarray: Вектор значений сходства длины N
+        """
+        features = prepared_index['features']
+
+        # Количество хороших совпадений и дескрипторов для каждой записи индекса
+        good_counts = np.zeros(len(features), dtype=np.float32)
+        gallery_sizes = np.zeros(len(features), dtype=np.float32)
+
+        if not self._has_descriptors(query_features):
+            return good_counts
+
+        # Дерево FLANN работает с float32, запрос преобразуется один раз
+        des1 = query_features[1].astype(np.float32)
+
+        # Делим индекс на непрерывные диапазоны по числу ядер
+        if self.search_pool is None:
+            self.search_pool = ThreadPoolExecutor(max_workers=self.search_workers)
+
+        step = max(1, -(-len(features) // self.search_workers))
+        futures = [
+            self.search_pool.submit(self._match_range, des1, prepared_index,
+                                    good_counts, gallery_sizes, start, start + step)
+            for start in range(0, len(features), step)
+        ]
+        errors = sum(future.result() for future in futures)
+
+        if errors:
+            logger.warning("Не удалось сравнить SIFT дескрипторы для %d записей индекса", errors)
+
+        # Записи без дескрипторов и с ошибками сравнения имеют нулевое количество совпадений
+        return self._scale_similarity(good_counts, len(des1), gallery_sizes)
+
+    def _match_range(self, des1, prepared_index, good_counts, gallery_sizes, start, stop):
+        """
+        Сравнение запроса с диапазоном записей индекса.
+        Результаты записываются в непересекающиеся участки выходных массивов.
+
+        Args:
+            des1 (numpy.ndarray): Дескрипторы запроса (float32)
+            prepared_index (dict): Результат prepare_index
+            good_counts (numpy.ndarray): Выход: количество хороших совпадений
+            gallery_sizes (numpy.ndarray): Выход: количество дескрипторов записи
+            start (int): Первая запись диапазона
+            stop (int): Запись после последней в диапазоне
+
+        Returns:
+            int: Количество записей, сравнить которые не удалось
+        """
+        features = prepared_index['features']
+        errors = 0
+
+        for i in range(start, min(stop, len(features))):
+            entry = features[i]
+            if not self._has_descriptors(entry):
+                continue
+
+            try:
+                flann_index = self._get_flann_index(prepared_index, i)
+                good_counts[i] = self._count_good_matches(flann_index, des1, len(entry[1]))
+                gallery_sizes[i] = len(entry[1])
+
+            except Exception as e:
+                errors += 1
+                logger.debug("Ошибка при сравнении SIFT дескрипторов записи %d: %s", i, e)
+
+        return errors
+
+    @staticmethod
+    def _has_descriptors(features):
+        """
+        Проверка, что признаки содержат непустые дескрипторы.
+
+        Args:
+            features: (keypoints_xy, descriptors) или None
+
+        Returns:
+            bool: True, если дескрипторы есть
+        """
+        if features is None:
+            return False
+
+        descriptors = features[1]
+        return descriptors is not None and len(descriptors) > 0
+
+    def _get_flann_index(self, prepared_index, i):
+        """
+        FLANN индекс изображения из кэша подготовленного индекса.
+        При первом обращении индекс загружается из сохраненного файла или строится.
+
+        Args:
+            prepared_index (dict): Результат prepare_index
+            i (int): Номер записи индекса
+
+        Returns:
+            cv2.flann_Index: FLANN индекс дескрипторов изображения
+        """
+        cached = prepared_index['flann_indexes'][i]
+        if cached is None:
+            descriptors = prepared_index['features'][i][1]
+            flann_dir = prepared_index['flann_dir']
+
+            if flann_dir is not None:
+                entry_keys = prepared_index['entry_keys']
+                name = self._flann_name(descriptors, entry_keys[i] if entry_keys is not None else None)
+                cached = self._load_flann_index(descriptors, os.path.join(flann_dir, name))
+            if cached is None:
+                cached = self._build_flann_index(descriptors)
+
+            prepared_index['flann_indexes'][i] = cached
+
+        return cached[0]
+
+    def _build_flann_index(self, descriptors):
+        """
+        Построение FLANN индекса по дескрипторам одного изображения.
+
+        Args:
+            descriptors (numpy.ndarray): Дескрипторы изображения (uint8 или float32)
+
+        Returns:
+            tuple: (индекс cv2.flann_Index, дескрипторы float32, на которые он ссылается)
+        """
+        # kd-дерево FLANN поддерживает только дескрипторы float32.
+        # Индекс не копирует данные, поэтому массив хранится вместе с ним
+        data = descriptors.astype(np.float32)
+        return cv2.flann_Index(data, self._flann_index_params(len(data))), data
+
+    @staticmethod
+    def _load_flann_index(descriptors, path):
+        """
+        Загрузка сохраненного FLANN индекса изображения.
+
+        Args:
+            descriptors (numpy.ndarray): Дескрипторы изображения, по которым строился индекс
+            path (str): Путь к файлу индекса
+
+        Returns:
+            tuple: (индекс cv2.flann_Index, дескрипторы float32) или None, если загрузить не удалось
+        """
+        if not os.path.exists(path):
+            return None
+
+        data = descriptors.astype(np.float32)
+        flann_index = cv2.flann_Index()
+
+        try:
+            if not flann_index.load(data, path):
+                return None
+        except cv2.error:
+            # Файл поврежден или записан несовместимой версией FLANN
+            return None
+
+        return flann_index, data
+
+    def _flann_index_params(self, count):
+        """
+        Выбор параметров индекса FLANN.
+        Для небольших наборов одно kd-дерево строится и обходится быстрее случайного леса,
+        для очень больших - иерархическая кластеризация k-means.
+
+        Args:
+            count (int): Количество дескрипторов, по которым строится индекс
+
+        Returns:
+            dict: Параметры индекса FLANN
+        """
+        algorithm = self.flann_algorithm
+        if algorithm == 'auto':
+            if count < FLANN_SINGLE_TREE_MAX:
+                algorithm = FLANN_INDEX_KDTREE_SINGLE
+            elif count < FLANN_KDTREE_MAX:
+                algorithm = FLANN_INDEX_KDTREE
+            else:
+                algorithm = FLANN_INDEX_KMEANS
+
+        if algorithm == FLANN_INDEX_KDTREE_SINGLE:
+            return dict(algorithm=FLANN_INDEX_KDTREE_SINGLE, leaf_max_size=10)
+        if algorithm == FLANN_INDEX_KMEANS:
+            return dict(algorithm=FLANN_INDEX_KMEANS, branching=32, iterations=11)
+        return dict(algorithm=FLANN_INDEX_KDTREE, trees=4)
+
+    def _count_good_matches(self, flann_index, des1, count2):
+        """
+        Подсчет совпадений, прошедших тест Лоу.
+
+        Args:
+            flann_index (cv2.flann_Index): FLANN индекс дескрипторов второго изображения
+            des1 (numpy.ndarray): Дескрипторы первого изображения (float32)
+            count2 (int): Количество дескрипторов второго изображения
+
+        Returns:
+            int: Количество хороших совпадений
+        """
+        if count2 < 2:
+            # Второго соседа нет: единственный сосед всегда считается хорошим совпадением
+            return len(des1)
+
+        # Находим двух ближайших соседей для каждого дескриптора
+        _, dists = flann_index.knnSearch(des1, 2, params=self.flann_search_params)
+
+        # Тест Лоу: первый сосед значительно ближе второго.
+        # knnSearch возвращает квадраты расстояний L2, поэтому порог берется в квадрате
+        if NUMBA_AVAILABLE:
+            return lowe_count(dists, LOWE_RATIO_SQ)
+
+        good_mask = dists[:, 0] < LOWE_RATIO_SQ * dists[:, 1]
+        return int(good_mask.sum())
+
+    @staticmethod
+    def _scale_similarity(good_counts, count1, counts2):
+        """
+        Вычисление меры сходства по количеству хороших совпадений.
+        Работает как с числами, так и с массивами по всем записям индекса.
+
+        Args:
+            good_counts: Количество хороших совпадений
+            count1 (int): Количество дескрипторов запроса
+            counts2: Количество дескрипторов сравниваемых изображений
+
+        Returns:
+            Значение сходства от 0 до 1 (numpy.float32 или numpy.ndarray)
+        """
+        # Масштабируем для получения более интуитивных значений
+        similarity = 3.0 * np.float32(good_counts) / np.maximum(np.float32(count1), counts2)
+        return np.clip(similarity, 0.0, 1.0).astype(np.float32)
+
+    def _filter_matches_with_homography(self, keypoints_xy1, keypoints_xy2, query_idx, train_idx, threshold=3.0):
         """
         Дополнительная фильтрация совпадений с помощью вычисления гомографии.
         Это позволяет отфильтровать случайные совпадения.
 
         Args:
-            keypoints1: Ключевые точки первого изображения
-            keypoints2: Ключевые точки второго изображения
-            matches: Найденные совпадения
+            keypoints_xy1 (numpy.ndarray): Координаты ключевых точек первого изображения (K1, 2)
+            keypoints_xy2 (numpy.ndarray): Координаты ключевых точек второго изображения (K2, 2)
+            query_idx (numpy.ndarray): Индексы точек первого изображения в совпадениях
+            train_idx (numpy.ndarray): Индексы соответствующих точек второго изображения
             threshold: Порог для фильтрации выбросов
 
         Returns:
-            list: Отфильтрованные совпадения
+            tuple: (query_idx, train_idx) - индексы совпадений, согласованных с гомографией
         """
-        if len(matches) < 4:
-            return matches
+        if len(query_idx) < 4:
+            return query_idx, train_idx
 
-        # Преобразуем ключевые точки в numpy массивы
-        src_pts = np.float32([keypoints1[m.queryIdx].pt for m in matches]).reshape(-1, 1, 2)
-        dst_pts = np.float32([keypoints2[m.trainIdx].pt for m in matches]).reshape(-1, 1, 2)
+        # Выбираем координаты совпавших точек индексированием массивов
+        src_pts = keypoints_xy1[query_idx].reshape(-1, 1, 2)
+        dst_pts = keypoints_xy2[train_idx].reshape(-1, 1, 2)
 
         # Вычисляем матрицу гомографии
-        H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, threshold)
+        H, mask = cv2.findHomography(src_pts, dst_pts, HOMOGRAPHY_METHOD, threshold,
+                                     maxIters=2000, confidence=0.999)
 
         if H is None:
-            return matches
+            return query_idx, train_idx
 
         # Выбираем только совпадения, соответствующие найденной модели
-        good_matches = [matches[i] for i in range(len(matches)) if mask[i][0] > 0]
+        inliers = mask.ravel().astype(bool)
 
-        return good_matches
\ No newline at end of file
+        return query_idx[inliers], train_idx[inliers]
\ No newline at end of file
@@ -7,7 +7,9 @@
 import os
 import sys
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QPixmapCache
 from ui.main_window import ImageSearchApp
+from utils.image_utils import PIXMAP_CACHE_LIMIT_KB
 
 
 def main():
@@ -16,6 +18,9 @@ def main():
     """
     app = QApplication(sys.argv)
 
+    # Кэш миниатюр результатов (по умолчанию Qt хранит только 10 МБ)
+    QPixmapCache.setCacheLimit(PIXMAP_CACHE_LIMIT_KB)
+
     # Устанавливаем стили для всего приложения
     style_path = "ui/styles/style.qss"
     try:
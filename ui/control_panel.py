@@ -9,11 +9,14 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QForm
                              QDoubleSpinBox, QCheckBox, QApplication, QStyle, QToolButton,
                              QMenu)
 from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5.QtGui import QPixmap, QIcon
+from PyQt5.QtGui import QIcon
 
 from feature_extractors import AVAILABLE_EXTRACTORS
 from ui.models_info_dialog import ModelsInfoDialog
 from ui.drag_drop_support import DragDropMixin
+from utils.image_utils import load_image_pixmap
+from batch_processing.index_storage import (get_index_path, INDEX_DIR_NAME,
+                                            INDEX_FILE_PREFIX, INDEX_FILE_SUFFIX)
 
 
 class ControlPanel(QWidget, DragDropMixin):
@@ -206,10 +209,9 @@ class ControlPanel(QWidget, DragDropMixin):
         """
         self.query_image_path = file_path
 
-        # Отображаем предпросмотр
-        pixmap = QPixmap(file_path)
-        if not pixmap.isNull():
-            pixmap = pixmap.scaled(200, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        # Отображаем предпросмотр: изображение сразу декодируется в размере превью
+        pixmap = load_image_pixmap(file_path, 200, 200)
+        if pixmap is not None:
             self.preview_label.setPixmap(pixmap)
 
             # Обновляем статус
@@ -280,10 +282,9 @@ class ControlPanel(QWidget, DragDropMixin):
         if file_path:
             self.query_image_path = file_path
 
-            # Отображаем предпросмотр
-            pixmap = QPixmap(file_path)
-            if not pixmap.isNull():
-                pixmap = pixmap.scaled(200, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            # Отображаем предпросмотр: изображение сразу декодируется в размере превью
+            pixmap = load_image_pixmap(file_path, 200, 200)
+            if pixmap is not None:
                 self.preview_label.setPixmap(pixmap)
             else:
                 self.preview_label.setText("Не удалось загрузить изображение")
@@ -316,11 +317,8 @@ class ControlPanel(QWidget, DragDropMixin):
         extractor = AVAILABLE_EXTRACTORS[self.model_combo.currentIndex()]
 
         # Формируем путь для сохранения индекса
-        index_dir = os.path.join(self.search_folder, ".index")
-        os.makedirs(index_dir, exist_ok=True)
-
-        extractor_name = extractor.name.replace(" ", "_").lower()
-        index_path = os.path.join(index_dir, f"image_index_{extractor_name}.pkl")
+        index_path = get_index_path(self.search_folder, extractor.name)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
 
         # Отправляем сигнал для индексации
         self.index_folder_requested.emit(self.search_folder, extractor, index_path)
@@ -332,10 +330,11 @@ class ControlPanel(QWidget, DragDropMixin):
         Args:
             folder_path (str): Путь к папке
         """
-        index_dir = os.path.join(folder_path, ".index")
+        index_dir = os.path.join(folder_path, INDEX_DIR_NAME)
 
         if os.path.exists(index_dir):
-            index_files = [f for f in os.listdir(index_dir) if f.startswith("image_index_") and f.endswith(".pkl")]
+            index_files = [f for f in os.listdir(index_dir)
+                           if f.startswith(INDEX_FILE_PREFIX) and f.endswith(INDEX_FILE_SUFFIX)]
 
             if index_files:
                 self.indexed_folders.append(folder_path)
@@ -3,9 +3,13 @@
 Расширение функциональности перетаскивания файлов (drag & drop) для панели управления.
 """
 
+import os
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent
 
+# При перетаскивании принимаются те же расширения, что и при поиске в папке
+from utils.file_utils import IMAGE_EXTENSIONS
+
 
 class DragDropMixin:
     """
@@ -31,14 +35,14 @@ class DragDropMixin:
             event (QDragEnterEvent): Событие перетаскивания
         """
         # Проверяем, есть ли в событии URL-адреса (файлы)
-        if event.mimeData().hasUrls():
+        mime_data = event.mimeData()
+        if mime_data.hasUrls():
             # Принимаем только файлы изображений
-            for url in event.mimeData().urls():
-                file_path = url.toLocalFile()
-                extension = file_path.lower().split('.')[-1]
+            for url in mime_data.urls():
+                extension = os.path.splitext(url.toLocalFile())[1].lower()
 
                 # Проверяем расширение файла
-                if extension in ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp']:
+                if extension in IMAGE_EXTENSIONS:
                     event.acceptProposedAction()
                     return
 
@@ -58,10 +62,10 @@ class DragDropMixin:
         if urls:
             # Берем только первый файл
             file_path = urls[0].toLocalFile()
-            extension = file_path.lower().split('.')[-1]
+            extension = os.path.splitext(file_path)[1].lower()
 
             # Проверяем, что это изображение
-            if extension in ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp']:
+            if extension in IMAGE_EXTENSIONS:
                 # Вызываем обработчик
                 self.handle_image_drop(file_path)
                 event.acceptProposedAction()
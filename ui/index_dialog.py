@@ -4,15 +4,18 @@
 """
 
 import os
-import re
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QPushButton, QProgressBar, QComboBox, QFormLayout,
-                             QRadioButton, QGroupBox, QButtonGroup, QListWidget,
+                             QRadioButton, QGroupBox, QButtonGroup, QListWidget, QListWidgetItem,
                              QTabWidget, QWidget, QMessageBox)
 from PyQt5.QtCore import Qt, pyqtSignal
 
 from feature_extractors import AVAILABLE_EXTRACTORS
 from workers.index_worker import IndexWorker
+from workers.index_scan_worker import IndexScanWorker
+from batch_processing.feature_indexer import MODE_APPEND, MODE_REBUILD, MODE_PRUNE
+from batch_processing.index_storage import get_index_path
+from batch_processing.index_registry import IndexRegistry
 
 
 class IndexDialog(QDialog):
@@ -26,7 +29,7 @@ class IndexDialog(QDialog):
     index_completed = pyqtSignal(str)
     index_progress = pyqtSignal(int)
 
-    def __init__(self, folder_path, extractor, output_path=None, parent=None):
+    def __init__(self, folder_path, extractor, output_path=None, parent=None, registry=None):
         """
         Инициализация диалогового окна.
 
@@ -35,61 +38,67 @@ class IndexDialog(QDialog):
             extractor: Экстрактор признаков по умолчанию
             output_path (str, optional): Путь для сохранения индекса
             parent: Родительский виджет
+            registry (IndexRegistry, optional): Общий реестр индексов приложения
         """
         super(IndexDialog, self).__init__(parent)
 
+        self.registry = registry if registry is not None else IndexRegistry()
         self.folder_path = folder_path
         self.extractor = extractor
         self.output_path = output_path
         self.index_worker = None
+        self.scan_worker = None
         self.existing_indexes = []
 
+        # Элементы управления, которые отключаются на время индексации
+        self._controls = []
+
         # Устанавливаем заголовок и размер
         self.setWindowTitle("Индексация папки с изображениями")
         self.resize(600, 400)
         self.setModal(True)
 
-        # Находим существующие индексы
-        self.find_existing_indexes()
-
         # Инициализируем интерфейс
         self.init_ui()
 
+        # Находим существующие индексы, вкладка с ними добавится по готовности
+        self.find_existing_indexes()
+
     def find_existing_indexes(self):
         """
-        Поиск существующих индексов в папке.
+        Запуск поиска существующих индексов в папке в фоновом потоке.
+        """
+        self.status_label.setText("Поиск существующих индексов...")
+
+        self.scan_worker = IndexScanWorker(self.registry, self.folder_path)
+        self.scan_worker.indexes_found.connect(self.set_existing_indexes)
+        self.scan_worker.start()
+
+    def set_existing_indexes(self, indexes):
+        """
+        Отображение найденных индексов.
+
+        Args:
+            indexes (list): Описания индексов папки
         """
-        index_dir = os.path.join(self.folder_path, ".index")
-        if not os.path.exists(index_dir):
+        # Во время индексации вкладки не меняются
+        if self.index_worker is not None:
+            return
+
+        self.status_label.setText("Готово к индексации")
+
+        self.existing_indexes = indexes
+        if not indexes:
             return
 
-        # Ищем файлы индексов
-        index_files = [f for f in os.listdir(index_dir) if f.startswith("image_index_") and f.endswith(".pkl")]
-
-        # Извлекаем информацию о моделях из имен файлов
-        for index_file in index_files:
-            index_path = os.path.join(index_dir, index_file)
-
-            # Извлекаем имя модели из имени файла
-            match = re.search(r"image_index_(.+)\.pkl", index_file)
-            if match:
-                model_name = match.group(1).replace("_", " ")
-
-                # Находим соответствующий экстрактор
-                matching_extractor = None
-                for ext in AVAILABLE_EXTRACTORS:
-                    if ext.name.lower().replace(" ", "_") == model_name.lower().replace(" ", "_"):
-                        matching_extractor = ext
-                        break
-
-                if matching_extractor:
-                    # Если найден соответствующий экстрактор, добавляем в список
-                    self.existing_indexes.append({
-                        'path': index_path,
-                        'name': model_name,
-                        'extractor': matching_extractor,
-                        'file': index_file
-                    })
+        # Добавляем информацию о том, какие модели уже проиндексированы
+        existing_models = [index['name'] for index in indexes]
+        self.existing_info.setText(f"<i>Уже проиндексированы: {', '.join(existing_models)}</i>")
+        self.existing_info.show()
+
+        existing_index_tab = QWidget()
+        self.init_existing_index_tab(existing_index_tab)
+        self.tab_widget.addTab(existing_index_tab, "Использовать существующий индекс")
 
     def init_ui(self):
         """
@@ -103,20 +112,14 @@ class IndexDialog(QDialog):
         main_layout.addWidget(folder_info)
 
         # Вкладки для разных режимов
-        tab_widget = QTabWidget()
+        self.tab_widget = QTabWidget()
 
         # Вкладка создания нового индекса
         new_index_tab = QWidget()
         self.init_new_index_tab(new_index_tab)
-        tab_widget.addTab(new_index_tab, "Создать новый индекс")
+        self.tab_widget.addTab(new_index_tab, "Создать новый индекс")
 
-        # Вкладка с существующими индексами
-        if self.existing_indexes:
-            existing_index_tab = QWidget()
-            self.init_existing_index_tab(existing_index_tab)
-            tab_widget.addTab(existing_index_tab, "Использовать существующий индекс")
-
-        main_layout.addWidget(tab_widget)
+        main_layout.addWidget(self.tab_widget)
 
         # Индикатор прогресса
         self.progress_bar = QProgressBar()
@@ -140,6 +143,7 @@ class IndexDialog(QDialog):
 
         self.start_button = QPushButton("Начать индексацию")
         self.start_button.clicked.connect(self.start_indexing)
+        self._controls.append(self.start_button)
         buttons_layout.addWidget(self.start_button)
 
         main_layout.addLayout(buttons_layout)
@@ -157,24 +161,24 @@ class IndexDialog(QDialog):
         form_layout = QFormLayout()
 
         # Выбор экстрактора признаков
+        # Экстрактор хранится в данных элемента, поэтому не зависит от порядка списка
         self.extractor_combo = QComboBox()
         for ext in AVAILABLE_EXTRACTORS:
-            self.extractor_combo.addItem(ext.name)
+            self.extractor_combo.addItem(ext.name, ext)
 
         # Устанавливаем текущий экстрактор
-        for i, ext in enumerate(AVAILABLE_EXTRACTORS):
-            if ext.name == self.extractor.name:
-                self.extractor_combo.setCurrentIndex(i)
-                break
+        current = self.extractor_combo.findText(self.extractor.name)
+        if current >= 0:
+            self.extractor_combo.setCurrentIndex(current)
 
-        # Добавляем информацию о том, какие модели уже проиндексированы
-        if self.existing_indexes:
-            existing_models = [index['name'] for index in self.existing_indexes]
-            existing_info = QLabel(f"<i>Уже проиндексированы: {', '.join(existing_models)}</i>")
-            existing_info.setStyleSheet("color: gray;")
-            layout.addWidget(existing_info)
+        # Информация о том, какие модели уже проиндексированы, появляется после поиска индексов
+        self.existing_info = QLabel()
+        self.existing_info.setStyleSheet("color: gray;")
+        self.existing_info.hide()
+        layout.addWidget(self.existing_info)
 
         form_layout.addRow("Экстрактор признаков:", self.extractor_combo)
+        self._controls.append(self.extractor_combo)
         layout.addLayout(form_layout)
 
         # Добавляем описание
@@ -199,7 +203,9 @@ class IndexDialog(QDialog):
 
         # Заполняем список
         for index in self.existing_indexes:
-            self.index_list.addItem(f"{index['name']} ({os.path.basename(index['path'])})")
+            item = QListWidgetItem(f"{index['name']} ({os.path.basename(index['path'])})")
+            item.setData(Qt.UserRole, index)
+            self.index_list.addItem(item)
 
         # Выбираем первый элемент
         if self.index_list.count() > 0:
@@ -220,36 +226,54 @@ class IndexDialog(QDialog):
 
         self.update_existing_radio = QRadioButton("Обновить выбранный индекс (добавить новые изображения)")
         self.recreate_radio = QRadioButton("Пересоздать индекс (полная переиндексация)")
+        self.prune_radio = QRadioButton("Удалить записи об отсутствующих файлах")
 
         self.update_existing_radio.setChecked(True)
 
         options_layout.addWidget(self.update_existing_radio)
         options_layout.addWidget(self.recreate_radio)
+        options_layout.addWidget(self.prune_radio)
+
+        self._controls.extend([self.index_list, self.update_existing_radio,
+                               self.recreate_radio, self.prune_radio])
 
         layout.addWidget(options_group)
         layout.addStretch()
 
+    def _set_controls_enabled(self, enabled):
+        """
+        Включение или отключение элементов управления одной перерисовкой.
+
+        Args:
+            enabled (bool): True - включить элементы
+        """
+        self.setUpdatesEnabled(False)
+        for widget in self._controls:
+            widget.setEnabled(enabled)
+        self.setUpdatesEnabled(True)
+
     def start_indexing(self):
         """
         Запуск процесса индексации.
         """
         # Проверяем, на какой вкладке находимся
-        tab_index = self.findChild(QTabWidget).currentIndex()
+        tab_index = self.tab_widget.currentIndex()
+
+        # Признаки неизмененных файлов берутся из существующего индекса
+        mode = MODE_APPEND
 
         if tab_index == 0 or not self.existing_indexes:
             # Создание нового индекса
-            selected_extractor = AVAILABLE_EXTRACTORS[self.extractor_combo.currentIndex()]
+            selected_extractor = self.extractor_combo.currentData()
 
             # Создаем путь для сохранения индекса, если не указан
             if not self.output_path:
-                extractor_name = selected_extractor.name.replace(" ", "_").lower()
-                index_dir = os.path.join(self.folder_path, ".index")
-                os.makedirs(index_dir, exist_ok=True)
-                self.output_path = os.path.join(index_dir, f"image_index_{extractor_name}.pkl")
+                self.output_path = get_index_path(self.folder_path, selected_extractor.name)
+                os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
 
         else:
             # Использование существующего индекса
-            selected_index = self.existing_indexes[self.index_list.currentRow()]
+            selected_index = self.index_list.currentItem().data(Qt.UserRole)
             selected_extractor = selected_index['extractor']
             self.output_path = selected_index['path']
 
@@ -268,17 +292,13 @@ class IndexDialog(QDialog):
                 if reply == QMessageBox.No:
                     return
 
+                mode = MODE_REBUILD
+            elif self.prune_radio.isChecked():
+                mode = MODE_PRUNE
+
         # Обновляем статус
         self.status_label.setText("Начинаем индексацию...")
-        self.start_button.setEnabled(False)
-        if hasattr(self, 'extractor_combo'):
-            self.extractor_combo.setEnabled(False)
-        if hasattr(self, 'index_list'):
-            self.index_list.setEnabled(False)
-        if hasattr(self, 'update_existing_radio'):
-            self.update_existing_radio.setEnabled(False)
-        if hasattr(self, 'recreate_radio'):
-            self.recreate_radio.setEnabled(False)
+        self._set_controls_enabled(False)
 
         self.cancel_button.setText("Остановить индексацию")
         self.cancel_button.clicked.disconnect()
@@ -288,7 +308,8 @@ class IndexDialog(QDialog):
         self.index_worker = IndexWorker(
             self.folder_path,
             selected_extractor,
-            self.output_path
+            self.output_path,
+            mode
         )
 
         # Подключаем сигналы
@@ -342,15 +363,7 @@ class IndexDialog(QDialog):
         """
         self.status_label.setText(f"Ошибка индексации: {error_message}")
         self.progress_bar.setValue(0)
-        self.start_button.setEnabled(True)
-        if hasattr(self, 'extractor_combo'):
-            self.extractor_combo.setEnabled(True)
-        if hasattr(self, 'index_list'):
-            self.index_list.setEnabled(True)
-        if hasattr(self, 'update_existing_radio'):
-            self.update_existing_radio.setEnabled(True)
-        if hasattr(self, 'recreate_radio'):
-            self.recreate_radio.setEnabled(True)
+        self._set_controls_enabled(True)
         self.cancel_button.setText("Закрыть")
         self.cancel_button.clicked.disconnect()
         self.cancel_button.clicked.connect(self.reject)
@@ -361,19 +374,23 @@ class IndexDialog(QDialog):
         """
         self.status_label.setText("Индексация была отменена")
         self.progress_bar.setValue(0)
-        self.start_button.setEnabled(True)
-        if hasattr(self, 'extractor_combo'):
-            self.extractor_combo.setEnabled(True)
-        if hasattr(self, 'index_list'):
-            self.index_list.setEnabled(True)
-        if hasattr(self, 'update_existing_radio'):
-            self.update_existing_radio.setEnabled(True)
-        if hasattr(self, 'recreate_radio'):
-            self.recreate_radio.setEnabled(True)
+        self._set_controls_enabled(True)
         self.cancel_button.setText("Закрыть")
         self.cancel_button.clicked.disconnect()
         self.cancel_button.clicked.connect(self.reject)
 
+    def done(self, result):
+        """
+        Закрытие диалога. Поток поиска индексов должен завершиться до удаления диалога.
+
+        Args:
+            result (int): Код завершения диалога
+        """
+        if self.scan_worker and self.scan_worker.isRunning():
+            self.scan_worker.wait()
+
+        super(IndexDialog, self).done(result)
+
     def closeEvent(self, event):
         """
         Обработка события закрытия диалога.
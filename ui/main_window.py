@@ -4,8 +4,9 @@
 """
 
 import os
+from collections import OrderedDict
 from PyQt5.QtWidgets import QMainWindow, QMessageBox, QWidget, QVBoxLayout, QStatusBar, QLabel
-from PyQt5.QtCore import Qt, pyqtSignal, QObject, QThread
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QThread, QMutex, QMutexLocker
 
 from ui.control_panel import ControlPanel
 from ui.index_dialog import IndexDialog
@@ -14,6 +15,10 @@ from workers.search_worker import SearchWorker
 from workers.index_worker import IndexWorker
 from utils.file_utils import create_results_folder, save_search_results
 from batch_processing.batch_search import BatchSearchProcessor
+from batch_processing.index_registry import IndexRegistry
+
+# Количество изображений запроса, признаки которых хранятся между поисками
+QUERY_CACHE_SIZE = 64
 
 
 # Создаем отдельный класс для выполнения индексированного поиска в фоновом потоке
@@ -24,8 +29,11 @@ class IndexedSearchWorker(QThread):
     progress_update = pyqtSignal(int)
     result_ready = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
+    query_features_ready = pyqtSignal(object)
+    search_cancelled = pyqtSignal()
 
-    def __init__(self, query_image_path, index_path, extractor, similarity_threshold, max_results):
+    def __init__(self, query_image_path, index_path, extractor, similarity_threshold, max_results,
+                 precomputed_query_features=None, index_mtime_ns=None, batch_processor=None):
         """
         Инициализация рабочего потока.
 
@@ -35,6 +43,9 @@ class IndexedSearchWorker(QThread):
             extractor: Экстрактор признаков
             similarity_threshold (float): Порог сходства
             max_results (int): Максимальное количество результатов
+            precomputed_query_features (optional): Уже извлеченные признаки запроса
+            index_mtime_ns (int, optional): Время изменения файла индекса на момент запуска поиска
+            batch_processor (BatchSearchProcessor, optional): Общий процессор поиска приложения
         """
         super().__init__()
         self.query_image_path = query_image_path
@@ -42,7 +53,34 @@ class IndexedSearchWorker(QThread):
         self.extractor = extractor
         self.similarity_threshold = similarity_threshold
         self.max_results = max_results
-        self.batch_processor = BatchSearchProcessor()
+        self.precomputed_query_features = precomputed_query_features
+        self.index_mtime_ns = index_mtime_ns
+        self.batch_processor = batch_processor if batch_processor is not None else BatchSearchProcessor()
+
+        # Флаги для контроля выполнения
+        self.running = True
+        self.mutex = QMutex()
+
+    def stop(self):
+        """
+        Остановка поиска. Поток завершается на ближайшей контрольной точке.
+        """
+        with QMutexLocker(self.mutex):
+            self.running = False
+
+    def _check_cancelled(self):
+        """
+        Проверка запроса на остановку.
+
+        Returns:
+            bool: True, если поиск отменен (сигнал отмены уже отправлен)
+        """
+        with QMutexLocker(self.mutex):
+            if self.running:
+                return False
+
+        self.search_cancelled.emit()
+        return True
 
     def run(self):
         """
@@ -52,11 +90,21 @@ class IndexedSearchWorker(QThread):
             # Обновляем прогресс
             self.progress_update.emit(10)
 
-            # Извлекаем признаки из запроса
-            query_features = self.extractor.extract_features(self.query_image_path)
+            if self._check_cancelled():
+                return
 
+            # Извлекаем признаки из запроса, если они не были извлечены раньше
+            query_features = self.precomputed_query_features
             if query_features is None:
-                self.error_occurred.emit("Не удалось извлечь признаки из изображения запроса")
+                query_features = self.extractor.extract_features(self.query_image_path)
+
+                if query_features is None:
+                    self.error_occurred.emit("Не удалось извлечь признаки из изображения запроса")
+                    return
+
+                self.query_features_ready.emit(query_features)
+
+            if self._check_cancelled():
                 return
 
             self.progress_update.emit(30)
@@ -66,9 +114,13 @@ class IndexedSearchWorker(QThread):
                 query_features,
                 self.index_path,
                 self.similarity_threshold,
-                self.max_results
+                self.max_results,
+                self.index_mtime_ns
             )
 
+            if self._check_cancelled():
+                return
+
             self.progress_update.emit(90)
 
             # Отправляем результаты
@@ -97,6 +149,15 @@ class ImageSearchApp(QMainWindow):
         self.indexed_search_worker = None
         self.last_results = []
 
+        # Признаки изображений запроса: (экстрактор, путь, mtime, размер) -> признаки
+        self.query_features_cache = OrderedDict()
+
+        # Найденные индексы папок, общие для поиска и диалога индексации
+        self.index_registry = IndexRegistry()
+
+        # Процессор поиска по индексам хранит загруженные индексы между запросами
+        self._batch_processor = BatchSearchProcessor()
+
         # Инициализация UI
         self.init_ui()
 
@@ -165,23 +226,21 @@ class ImageSearchApp(QMainWindow):
         use_index = self.control_panel.use_index_enabled()
 
         if use_index:
-            # Проверяем наличие индекса
-            index_dir = os.path.join(search_folder, ".index")
-            if os.path.exists(index_dir):
-                # Поиск индексов для текущего экстрактора
-                extractor_name = extractor.name.replace(" ", "_").lower()
-                index_path = os.path.join(index_dir, f"image_index_{extractor_name}.pkl")
-
-                if os.path.exists(index_path):
-                    # Если индекс существует, используем его для поиска
-                    self.start_indexed_search(
-                        query_image_path,
-                        index_path,
-                        extractor,
-                        similarity_threshold,
-                        max_results
-                    )
-                    return
+            # Поиск индекса для текущего экстрактора. Реестр перечитывает папку .index
+            # только при ее изменении и хранит время изменения файла индекса
+            index = self.index_registry.find(search_folder, extractor)
+
+            if index is not None:
+                # Если индекс существует, используем его для поиска
+                self.start_indexed_search(
+                    query_image_path,
+                    index['path'],
+                    extractor,
+                    similarity_threshold,
+                    max_results,
+                    index['mtime_ns']
+                )
+                return
 
         # Если индекс не используется или не найден, выполняем обычный поиск
         self.start_regular_search(
@@ -220,7 +279,8 @@ class ImageSearchApp(QMainWindow):
 
         self.search_worker.start()
 
-    def start_indexed_search(self, query_image_path, index_path, extractor, similarity_threshold, max_results):
+    def start_indexed_search(self, query_image_path, index_path, extractor, similarity_threshold, max_results,
+                             index_mtime_ns=None):
         """
         Запуск поиска с использованием индекса.
 
@@ -230,25 +290,75 @@ class ImageSearchApp(QMainWindow):
             extractor (FeatureExtractor): Экстрактор признаков
             similarity_threshold (float): Порог сходства (0-1)
             max_results (int): Максимальное количество результатов
+            index_mtime_ns (int, optional): Время изменения файла индекса
         """
+        # Повторные запросы с тем же изображением не извлекают признаки заново
+        cache_key = self._query_cache_key(query_image_path, extractor)
+        query_features = None
+        if cache_key is not None and cache_key in self.query_features_cache:
+            self.query_features_cache.move_to_end(cache_key)
+            query_features = self.query_features_cache[cache_key]
+
         # Создаем и запускаем поток для индексированного поиска
         self.indexed_search_worker = IndexedSearchWorker(
             query_image_path,
             index_path,
             extractor,
             similarity_threshold,
-            max_results
+            max_results,
+            query_features,
+            index_mtime_ns,
+            self._batch_processor
         )
 
+        if cache_key is not None:
+            self.indexed_search_worker.query_features_ready.connect(
+                lambda features: self.cache_query_features(cache_key, features)
+            )
+
         # Подключаем сигналы
         self.indexed_search_worker.progress_update.connect(self.update_progress)
         self.indexed_search_worker.result_ready.connect(self.display_results)
         self.indexed_search_worker.error_occurred.connect(self.show_error)
+        self.indexed_search_worker.search_cancelled.connect(self.search_cancelled)
         self.indexed_search_worker.finished.connect(self.search_finished)
 
         # Запускаем поток
         self.indexed_search_worker.start()
 
+    @staticmethod
+    def _query_cache_key(query_image_path, extractor):
+        """
+        Ключ кэша признаков запроса. Изменение файла меняет ключ.
+
+        Args:
+            query_image_path (str): Путь к изображению запроса
+            extractor (FeatureExtractor): Экстрактор признаков
+
+        Returns:
+            tuple: (название экстрактора, путь, mtime_ns, размер) или None, если файл недоступен
+        """
+        try:
+            st = os.stat(query_image_path)
+        except OSError:
+            return None
+
+        return extractor.name, query_image_path, st.st_mtime_ns, st.st_size
+
+    def cache_query_features(self, cache_key, features):
+        """
+        Сохранение признаков запроса в кэш с вытеснением давно не использованных.
+
+        Args:
+            cache_key (tuple): Ключ кэша
+            features: Признаки изображения запроса
+        """
+        self.query_features_cache[cache_key] = features
+        self.query_features_cache.move_to_end(cache_key)
+
+        while len(self.query_features_cache) > QUERY_CACHE_SIZE:
+            self.query_features_cache.popitem(last=False)
+
     def update_progress(self, value):
         """
         Обновление индикатора прогресса.
@@ -338,8 +448,8 @@ class ImageSearchApp(QMainWindow):
             self.search_worker.stop()
 
         if self.indexed_search_worker and self.indexed_search_worker.isRunning():
-            self.indexed_search_worker.terminate()
-            self.search_finished()
+            # Сигнал finished вызовет search_finished после остановки потока
+            self.indexed_search_worker.stop()
 
     def search_finished(self):
         """
@@ -358,7 +468,7 @@ class ImageSearchApp(QMainWindow):
             extractor: Экстрактор признаков
             output_path (str, optional): Путь для сохранения индекса
         """
-        dialog = IndexDialog(folder_path, extractor, output_path, self)
+        dialog = IndexDialog(folder_path, extractor, output_path, self, registry=self.index_registry)
         dialog.index_completed.connect(self.handle_index_completed)
         dialog.exec_()
 
@@ -393,7 +503,7 @@ class ImageSearchApp(QMainWindow):
             self.index_worker.wait()
 
         if self.indexed_search_worker and self.indexed_search_worker.isRunning():
-            self.indexed_search_worker.terminate()
+            self.indexed_search_worker.stop()
             self.indexed_search_worker.wait()
 
         event.accept()
\ No newline at end of file
@@ -4,11 +4,68 @@
 """
 
 import os
+import html
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-                             QTabWidget, QWidget, QScrollArea, QGridLayout, QSpacerItem,
-                             QSizePolicy)
-from PyQt5.QtGui import QPixmap, QIcon, QFont
-from PyQt5.QtCore import Qt, QSize, QSettings
+                             QTabWidget, QWidget, QScrollArea, QSpacerItem, QSizePolicy,
+                             QTextBrowser)
+from PyQt5.QtGui import QPixmap, QFont
+from PyQt5.QtCore import Qt, QSettings, QByteArray
+
+
+# Характеристики моделей для таблицы на вкладке подробностей:
+# (метод, использование, преимущества, недостатки)
+MODELS_DATA = (
+    ("SIFT", "Поиск похожих объектов и форм",
+     "• Устойчив к изменению масштаба и поворота\n• Высокая точность распознавания объектов\n• Хорошо работает с частичным перекрытием",
+     "• Требует больше вычислительных ресурсов\n• Медленнее, чем базовые методы"),
+
+    ("Цветовая гистограмма", "Поиск изображений с похожей цветовой гаммой",
+     "• Очень быстрый\n• Нечувствителен к содержимому\n• Хорошо находит похожие сцены/пейзажи",
+     "• Не учитывает форму и структуру\n• Может давать ложные срабатывания"),
+
+    ("CNN (ResNet50)", "Поиск изображений, основанный на глубоком обучении",
+     "• Высокая точность распознавания содержимого\n• Устойчивость к изменениям освещения и ракурса\n• Может распознавать абстрактные характеристики",
+     "• Требует значительных вычислительных ресурсов\n• Нуждается в GPU для быстрой работы\n• Зависит от обучающих данных"),
+
+    ("DeepFace", "Поиск лиц и распознавание людей",
+     "• Высокая точность распознавания лиц\n• Устойчивость к ракурсу и освещению\n• Современный метод на основе нейросетей",
+     "• Требует дополнительной установки\n• Медленнее других методов\n• Работает только с лицами")
+)
+
+
+def _details_cell(text, style=""):
+    """
+    Ячейка таблицы подробностей в HTML.
+
+    Args:
+        text (str): Текст ячейки, строки разделены переводом строки
+        style (str, optional): Стиль CSS ячейки
+
+    Returns:
+        str: Разметка ячейки
+    """
+    content = html.escape(text).replace("\n", "<br>")
+    return f'<td style="{style}">{content}</td>'
+
+
+# Таблица подробностей собирается один раз при импорте: статичная таблица
+# отображается одним QTextBrowser вместо отдельной метки на каждую ячейку
+MODELS_DETAILS_HTML = (
+    '<table width="100%" cellspacing="0" cellpadding="6" '
+    'style="font-family: Arial; font-size: 11pt;">'
+    '<tr>' + ''.join(
+        f'<th width="25%" style="font-size: 12pt;">{header}</th>'
+        for header in ("Метод", "Использование", "Преимущества", "Недостатки")
+    ) + '</tr>' + ''.join(
+        '<tr>'
+        + _details_cell(model, "font-weight: bold;")
+        + _details_cell(usage)
+        + _details_cell(pros, "color: #10b981;")
+        + _details_cell(cons, "color: #ef4444;")
+        + '</tr>'
+        for model, usage, pros, cons in MODELS_DATA
+    ) + '</table>'
+)
 
 
 class ModelsInfoDialog(QDialog):
@@ -17,6 +74,17 @@ class ModelsInfoDialog(QDialog):
     Предоставляет сравнение, характеристики и рекомендации по использованию.
     """
 
+    # Растровые версии инфографики SVG, общие для всех экземпляров диалога:
+    # {(путь, mtime_ns): QPixmap или None, если файла нет}
+    _comparison_pixmaps = {}
+
+    # Шрифты заголовков, общие для всех вкладок и экземпляров диалога.
+    # Создаются при первом открытии: QFont требует существующего QApplication
+    _fonts = None
+
+    # Настройки диалога: хранилище читается один раз за время работы приложения
+    _settings = None
+
     def __init__(self, parent=None):
         """
         Инициализация диалогового окна.
@@ -26,14 +94,19 @@ class ModelsInfoDialog(QDialog):
         """
         super(ModelsInfoDialog, self).__init__(parent)
 
-        self.settings = QSettings("ImageSearchApp", "ModelDialog")
+        if ModelsInfoDialog._settings is None:
+            ModelsInfoDialog._settings = QSettings("ImageSearchApp", "ModelDialog")
+        self.settings = ModelsInfoDialog._settings
 
         self.setWindowTitle("Сравнение моделей поиска изображений")
         self.setMinimumSize(800, 600)
 
-        # Восстанавливаем размер и положение окна, если были сохранены
-        if self.settings.contains("dialog_geometry"):
-            self.restoreGeometry(self.settings.value("dialog_geometry"))
+        # Восстанавливаем размер и положение окна, если были сохранены.
+        # Явный тип избавляет от преобразования QVariant, а пустое значение
+        # по умолчанию - от отдельной проверки contains()
+        geometry = self.settings.value("dialog_geometry", QByteArray(), type=QByteArray)
+        if not geometry.isEmpty():
+            self.restoreGeometry(geometry)
         else:
             # Устанавливаем окно по центру родительского окна
             if parent:
@@ -43,6 +116,13 @@ class ModelsInfoDialog(QDialog):
                     800, 600
                 )
 
+        if ModelsInfoDialog._fonts is None:
+            ModelsInfoDialog._fonts = {
+                'title': QFont("Arial", 14, QFont.Bold),
+                'header': QFont("Arial", 12, QFont.Bold),
+                'text': QFont("Arial", 11)
+            }
+
         # Создаем интерфейс
         self.init_ui()
 
@@ -62,14 +142,19 @@ class ModelsInfoDialog(QDialog):
 
         # Вкладка деталей
         self.details_tab = QWidget()
-        self.init_details_tab()
         self.tab_widget.addTab(self.details_tab, "Подробные характеристики")
 
         # Вкладка рекомендаций
         self.recommendations_tab = QWidget()
-        self.init_recommendations_tab()
         self.tab_widget.addTab(self.recommendations_tab, "Рекомендации по выбору")
 
+        # Содержимое остальных вкладок создается при первом переходе на них
+        self._tab_builders = {
+            self.tab_widget.indexOf(self.details_tab): self.init_details_tab,
+            self.tab_widget.indexOf(self.recommendations_tab): self.init_recommendations_tab
+        }
+        self.tab_widget.currentChanged.connect(self._build_tab)
+
         main_layout.addWidget(self.tab_widget)
 
         # Кнопки
@@ -85,6 +170,25 @@ class ModelsInfoDialog(QDialog):
 
         main_layout.addLayout(buttons_layout)
 
+    def _build_tab(self, index):
+        """
+        Создание содержимого вкладки при первом ее показе.
+
+        Args:
+            index (int): Номер выбранной вкладки
+        """
+        builder = self._tab_builders.pop(index, None)
+        if builder is None:
+            return
+
+        # Вкладка уже видна, поэтому ее содержимое перерисовывается один раз после заполнения
+        tab = self.tab_widget.widget(index)
+        tab.setUpdatesEnabled(False)
+        try:
+            builder()
+        finally:
+            tab.setUpdatesEnabled(True)
+
     def init_comparison_tab(self):
         """
         Инициализация вкладки общего сравнения моделей.
@@ -93,7 +197,7 @@ class ModelsInfoDialog(QDialog):
 
         # Заголовок
         title_label = QLabel("Сравнение методов поиска изображений")
-        title_label.setFont(QFont("Arial", 14, QFont.Bold))
+        title_label.setFont(self._fonts['title'])
         title_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(title_label)
 
@@ -108,90 +212,54 @@ class ModelsInfoDialog(QDialog):
         info_image_label = QLabel()
         info_image_path = os.path.join("ui", "resources", "models_comparison.svg")
 
-        if os.path.exists(info_image_path):
-            pixmap = QPixmap(info_image_path)
+        pixmap = self._comparison_pixmap(info_image_path)
+
+        if pixmap is not None:
             info_image_label.setPixmap(pixmap)
-            info_image_label.setAlignment(Qt.AlignCenter)
         else:
             info_image_label.setText("Изображение сравнения моделей не найдено")
-            info_image_label.setAlignment(Qt.AlignCenter)
+        info_image_label.setAlignment(Qt.AlignCenter)
 
         scroll_layout.addWidget(info_image_label)
         scroll_area.setWidget(scroll_content)
         layout.addWidget(scroll_area)
 
+    @classmethod
+    def _comparison_pixmap(cls, image_path):
+        """
+        Растровое изображение инфографики. SVG разбирается и растеризуется
+        один раз, пока файл не изменится.
+
+        Args:
+            image_path (str): Путь к файлу SVG
+
+        Returns:
+            QPixmap: Изображение или None, если файл не найден
+        """
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        key = (image_path, mtime)
+        if key not in cls._comparison_pixmaps:
+            # Отсутствующий или поврежденный файл дает пустой QPixmap,
+            # отдельная проверка существования не нужна
+            pixmap = QPixmap(image_path)
+            cls._comparison_pixmaps[key] = None if pixmap.isNull() else pixmap
+
+        return cls._comparison_pixmaps[key]
+
     def init_details_tab(self):
         """
         Инициализация вкладки подробных характеристик моделей.
         """
         layout = QVBoxLayout(self.details_tab)
 
-        # Область прокрутки для таблицы
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-
-        scroll_content = QWidget()
-        scroll_layout = QVBoxLayout(scroll_content)
-
-        # Создаем таблицу характеристик
-        grid_layout = QGridLayout()
-
-        # Заголовки
-        headers = ["Метод", "Использование", "Преимущества", "Недостатки"]
-        for col, header in enumerate(headers):
-            label = QLabel(header)
-            label.setFont(QFont("Arial", 12, QFont.Bold))
-            label.setAlignment(Qt.AlignCenter)
-            grid_layout.addWidget(label, 0, col)
-
-        # Данные моделей
-            # Данные моделей
-            models_data = [
-                ("SIFT", "Поиск похожих объектов и форм",
-                 "• Устойчив к изменению масштаба и поворота\n• Высокая точность распознавания объектов\n• Хорошо работает с частичным перекрытием",
-                 "• Требует больше вычислительных ресурсов\n• Медленнее, чем базовые методы"),
-
-                ("Цветовая гистограмма", "Поиск изображений с похожей цветовой гаммой",
-                 "• Очень быстрый\n• Нечувствителен к содержимому\n• Хорошо находит похожие сцены/пейзажи",
-                 "• Не учитывает форму и структуру\n• Может давать ложные срабатывания"),
-
-                ("CNN (ResNet50)", "Поиск изображений, основанный на глубоком обучении",
-                 "• Высокая точность распознавания содержимого\n• Устойчивость к изменениям освещения и ракурса\n• Может распознавать абстрактные характеристики",
-                 "• Требует значительных вычислительных ресурсов\n• Нуждается в GPU для быстрой работы\n• Зависит от обучающих данных"),
-
-                ("DeepFace", "Поиск лиц и распознавание людей",
-                 "• Высокая точность распознавания лиц\n• Устойчивость к ракурсу и освещению\n• Современный метод на основе нейросетей",
-                 "• Требует дополнительной установки\n• Медленнее других методов\n• Работает только с лицами")
-            ]
-
-        for row, (model, usage, pros, cons) in enumerate(models_data, 1):
-            # Название модели
-            model_label = QLabel(model)
-            model_label.setFont(QFont("Arial", 11, QFont.Bold))
-            grid_layout.addWidget(model_label, row, 0)
-
-            # Использование
-            usage_label = QLabel(usage)
-            usage_label.setWordWrap(True)
-            grid_layout.addWidget(usage_label, row, 1)
-
-            # Преимущества
-            pros_label = QLabel(pros)
-            pros_label.setStyleSheet("color: #10b981;")
-            grid_layout.addWidget(pros_label, row, 2)
-
-            # Недостатки
-            cons_label = QLabel(cons)
-            cons_label.setStyleSheet("color: #ef4444;")
-            grid_layout.addWidget(cons_label, row, 3)
-
-        # Настраиваем одинаковые размеры колонок
-        for col in range(4):
-            grid_layout.setColumnStretch(col, 1)
-
-        scroll_layout.addLayout(grid_layout)
-        scroll_area.setWidget(scroll_content)
-        layout.addWidget(scroll_area)
+        # Таблица характеристик: QTextBrowser сам прокручивает содержимое
+        details_browser = QTextBrowser()
+        details_browser.setHtml(MODELS_DETAILS_HTML)
+        layout.addWidget(details_browser)
 
     def init_recommendations_tab(self):
         """
@@ -208,7 +276,7 @@ class ModelsInfoDialog(QDialog):
 
         # Заголовок
         title_label = QLabel("Рекомендации по выбору модели")
-        title_label.setFont(QFont("Arial", 14, QFont.Bold))
+        title_label.setFont(self._fonts['title'])
         title_label.setAlignment(Qt.AlignCenter)
         scroll_layout.addWidget(title_label)
 
@@ -230,7 +298,7 @@ class ModelsInfoDialog(QDialog):
         for i, (title, description) in enumerate(recommendations):
             # Заголовок рекомендации
             rec_title = QLabel(title)
-            rec_title.setFont(QFont("Arial", 11))
+            rec_title.setFont(self._fonts['text'])
             scroll_layout.addWidget(rec_title)
 
             # Описание
@@ -241,7 +309,7 @@ class ModelsInfoDialog(QDialog):
 
         # Технические особенности
         tech_title = QLabel("<b>Технические особенности</b>")
-        tech_title.setFont(QFont("Arial", 12, QFont.Bold))
+        tech_title.setFont(self._fonts['header'])
         scroll_layout.addWidget(tech_title)
 
         tech_details = QLabel(
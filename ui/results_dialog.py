@@ -5,14 +5,13 @@
 
 import os
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
-                             QScrollArea, QGridLayout, QGroupBox, QPushButton,
-                             QFileDialog, QMessageBox, QSplitter, QFrame,
-                             QWidget, QProgressBar, QSizePolicy)
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QPixmap, QIcon
+                             QGroupBox, QPushButton, QFileDialog, QMessageBox,
+                             QFrame, QWidget, QSizePolicy)
+from PyQt5.QtCore import Qt
 
 from utils.image_utils import load_image_pixmap
 from utils.file_utils import create_results_folder, save_search_results
+from ui.results_grid import ResultsGrid, unique_results
 
 
 class ResultsDialog(QDialog):
@@ -34,7 +33,7 @@ class ResultsDialog(QDialog):
         super(ResultsDialog, self).__init__(parent)
 
         self.query_image_path = query_image_path
-        self.results = results
+        self.results = unique_results(results)
         self.extractor_name = extractor_name
         self.similarity_threshold = similarity_threshold
         self.results_folder = None
@@ -125,25 +124,25 @@ class ResultsDialog(QDialog):
         results_label.setStyleSheet("font-weight: bold; font-size: 14px;")
         main_layout.addWidget(results_label)
 
-        # Область прокрутки для результатов
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-
-        results_container = QWidget()
-        self.results_layout = QGridLayout(results_container)
-        self.results_layout.setContentsMargins(0, 0, 0, 0)
-        self.results_layout.setSpacing(12)  # Увеличиваем расстояние между изображениями
+        # Сетка результатов создает миниатюры только для видимых строк
+        self.results_grid = ResultsGrid(
+            columns=3,  # Меньше столбцов для увеличения размера изображений
+            thumbnail_size=400,
+            image_min_size=(350, 300),
+            cell_height=500,
+            spacing=12,
+            cell_margins=10,
+            info_point_size=12,  # Увеличиваем размер шрифта
+            filename_point_size=10
+        )
 
         # Добавляем результаты в сетку
         if self.results:
             self.display_results()
         else:
-            no_results_label = QLabel("Похожие изображения не найдены")
-            no_results_label.setAlignment(Qt.AlignCenter)
-            self.results_layout.addWidget(no_results_label, 0, 0)
+            self.results_grid.set_message("Похожие изображения не найдены")
 
-        scroll_area.setWidget(results_container)
-        main_layout.addWidget(scroll_area)
+        main_layout.addWidget(self.results_grid)
 
         # Нижняя панель с кнопками
         bottom_layout = QHBoxLayout()
@@ -167,46 +166,7 @@ class ResultsDialog(QDialog):
         """
         Отображение найденных изображений в сетке.
         """
-        row, col = 0, 0
-        max_cols = 3  # Уменьшаем количество столбцов для увеличения размера изображений
-
-        for i, (img_path, similarity) in enumerate(self.results):
-            # Создаем группу для изображения и информации
-            result_group = QGroupBox()
-            result_group.setObjectName("result_group")
-            result_layout = QVBoxLayout(result_group)
-            result_layout.setContentsMargins(10, 10, 10, 10)  # Увеличиваем отступы
-
-            # Загружаем и отображаем миниатюру с увеличенным размером
-            pixmap = load_image_pixmap(img_path, 400, 400)  # Значительно увеличиваем размер
-            if pixmap:
-                img_label = QLabel()
-                img_label.setPixmap(pixmap)
-                img_label.setAlignment(Qt.AlignCenter)
-                img_label.setMinimumSize(350, 300)  # Увеличиваем минимальный размер
-                result_layout.addWidget(img_label)
-
-                # Добавляем метку с информацией
-                info_label = QLabel(f"Сходство: {similarity:.2f}")
-                info_label.setAlignment(Qt.AlignCenter)
-                info_label.setStyleSheet("font-size: 12pt;")  # Увеличиваем размер шрифта
-                result_layout.addWidget(info_label)
-
-                # Добавляем название файла
-                filename_label = QLabel(os.path.basename(img_path))
-                filename_label.setAlignment(Qt.AlignCenter)
-                filename_label.setWordWrap(True)
-                filename_label.setStyleSheet("font-size: 10pt;")  # Увеличиваем размер шрифта
-                result_layout.addWidget(filename_label)
-
-                # Добавляем группу в сетку
-                self.results_layout.addWidget(result_group, row, col)
-
-                # Переходим к следующей ячейке сетки
-                col += 1
-                if col >= max_cols:
-                    col = 0
-                    row += 1
+        self.results_grid.set_results(self.results)
 
     def select_results_folder(self):
         """
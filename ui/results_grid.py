@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+"""
+Сетка миниатюр результатов поиска на основе QListView.
+
+Результаты хранятся в модели, а ячейки рисуются делегатом, поэтому
+виджеты для результатов не создаются, а миниатюры загружаются
+только для ячеек, которые представление действительно отрисовывает.
+"""
+
+import os
+from PyQt5.QtWidgets import QListView, QLabel, QStyledItemDelegate, QStyle, QAbstractItemView
+from PyQt5.QtGui import QPixmap, QPixmapCache, QColor, QPen, QFont, QFontMetrics, QPainter
+from PyQt5.QtCore import (Qt, QObject, QRunnable, QThreadPool, QAbstractListModel,
+                          QModelIndex, QRect, QSize, pyqtSignal)
+
+from utils.image_utils import load_image_thumbnail, pixmap_cache_key
+
+# Наибольшее количество потоков загрузки миниатюр
+MAX_THUMBNAIL_THREADS = 8
+
+# Количество ячеек, размещаемых представлением за один проход цикла событий
+LAYOUT_BATCH_SIZE = 50
+
+# Роли модели со значением сходства результата и готовой подписью сходства
+SIMILARITY_ROLE = Qt.UserRole + 1
+SIMILARITY_TEXT_ROLE = Qt.UserRole + 2
+
+# Цвета ячеек результатов (совпадают со стилем result_group в style.qss)
+CELL_BORDER_COLOR = QColor("#e5e7eb")
+CELL_HOVER_BORDER_COLOR = QColor("#6366f1")
+CELL_BACKGROUND_COLOR = QColor("#ffffff")
+CELL_HOVER_BACKGROUND_COLOR = QColor("#f5f5ff")
+PLACEHOLDER_COLOR = QColor("#6b7280")
+
+
+def unique_results(results):
+    """
+    Удаление повторяющихся путей из результатов поиска. Для каждого пути
+    остается первое вхождение, то есть результат с наибольшим сходством,
+    и одно изображение не декодируется дважды.
+
+    Args:
+        results (list): Список кортежей (путь к изображению, сходство)
+
+    Returns:
+        list: Результаты без повторов в исходном порядке
+    """
+    seen = set()
+    unique = []
+
+    for img_path, similarity in results:
+        if img_path not in seen:
+            seen.add(img_path)
+            unique.append((img_path, similarity))
+
+    return unique
+
+
+class ThumbnailSignals(QObject):
+    """
+    Сигналы загрузчиков миниатюр.
+
+    Signals:
+        loaded (int, int, str, object): Поколение результатов, номер результата,
+            ключ кэша и QImage (None, если изображение не загрузилось)
+    """
+    loaded = pyqtSignal(int, int, str, object)
+
+
+class ThumbnailLoader(QRunnable):
+    """
+    Загрузка и масштабирование миниатюры в потоке пула.
+    QPixmap создается из результата уже в потоке интерфейса.
+    """
+
+    def __init__(self, model, generation, row, image_path, cache_key):
+        """
+        Инициализация загрузчика.
+
+        Args:
+            model (ResultsModel): Модель, для которой загружается миниатюра
+            generation (int): Поколение результатов модели на момент запуска
+            row (int): Номер результата
+            image_path (str): Путь к изображению
+            cache_key (str): Ключ QPixmapCache
+        """
+        super(ThumbnailLoader, self).__init__()
+        self.model = model
+        self.signals = model.thumbnail_signals
+        self.generation = generation
+        self.row = row
+        self.image_path = image_path
+        self.cache_key = cache_key
+
+    def run(self):
+        """
+        Загрузка миниатюры, если результаты модели не сменились.
+        """
+        if self.generation != self.model.generation:
+            return
+
+        image = load_image_thumbnail(self.image_path, self.model.thumbnail_size, self.model.thumbnail_size)
+
+        try:
+            self.signals.loaded.emit(self.generation, self.row, self.cache_key, image)
+        except RuntimeError:
+            # Модель уже удалена
+            pass
+
+
+class ResultsModel(QAbstractListModel):
+    """
+    Модель списка результатов поиска.
+
+    Миниатюра (Qt.DecorationRole) берется из QPixmapCache; при промахе
+    запускается ее загрузка в пуле потоков, а после загрузки модель
+    сообщает об изменении строки.
+    """
+
+    def __init__(self, thumbnail_size, parent=None):
+        """
+        Инициализация модели.
+
+        Args:
+            thumbnail_size (int): Наибольший размер стороны миниатюры
+            parent: Родительский объект
+        """
+        super(ResultsModel, self).__init__(parent)
+
+        self.thumbnail_size = thumbnail_size
+        self.results = []
+        self.labels = []  # [(имя файла, подпись сходства)] для каждого результата
+        self.cache_keys = {}  # {номер результата: ключ QPixmapCache}
+        self.pending = set()  # Номера результатов, миниатюры которых загружаются
+        self.failed = set()  # Номера результатов, изображения которых не загрузились
+
+        # Поколение результатов: миниатюры прежних результатов не отображаются
+        self.generation = 0
+
+        # Пул создается раньше объекта сигналов, поэтому при удалении модели
+        # он дожидается загрузчиков, пока сигналы еще существуют
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(min(MAX_THUMBNAIL_THREADS, os.cpu_count() or 1))
+        self.thumbnail_signals = ThumbnailSignals(self)
+        self.thumbnail_signals.loaded.connect(self._set_thumbnail)
+
+    def set_results(self, results):
+        """
+        Замена результатов модели.
+
+        Args:
+            results (list): Список кортежей (путь к изображению, сходство)
+        """
+        self.beginResetModel()
+
+        # Загрузка миниатюр прежних результатов больше не нужна
+        self.generation += 1
+        self.thread_pool.clear()
+
+        self.results = results
+
+        # Подписи рассчитываются один раз, а не при каждой отрисовке ячейки
+        self.labels = [(os.path.basename(img_path), f"Сходство: {similarity:.2f}")
+                       for img_path, similarity in results]
+        self.cache_keys = {}
+        self.pending = set()
+        self.failed = set()
+
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Количество результатов.
+
+        Args:
+            parent (QModelIndex): Родительский индекс (у списка его нет)
+
+        Returns:
+            int: Количество строк
+        """
+        return 0 if parent.isValid() else len(self.results)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Данные результата для представления и делегата.
+
+        Args:
+            index (QModelIndex): Индекс результата
+            role (int): Роль данных
+
+        Returns:
+            Имя файла (Qt.DisplayRole), путь (Qt.ToolTipRole, Qt.UserRole),
+            сходство (SIMILARITY_ROLE), подпись сходства (SIMILARITY_TEXT_ROLE),
+            QPixmap или None (Qt.DecorationRole)
+        """
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        img_path, similarity = self.results[row]
+
+        if role == Qt.DisplayRole:
+            return self.labels[row][0]
+        if role == SIMILARITY_TEXT_ROLE:
+            return self.labels[row][1]
+        if role in (Qt.ToolTipRole, Qt.UserRole):
+            return img_path
+        if role == SIMILARITY_ROLE:
+            return similarity
+        if role == Qt.DecorationRole:
+            return self._thumbnail(row, img_path)
+
+        return None
+
+    def is_failed(self, row):
+        """
+        Проверка, что изображение результата не удалось загрузить.
+
+        Args:
+            row (int): Номер результата
+
+        Returns:
+            bool: True, если миниатюры не будет
+        """
+        return row in self.failed
+
+    def _thumbnail(self, row, img_path):
+        """
+        Миниатюра результата из кэша или запуск ее загрузки.
+
+        Args:
+            row (int): Номер результата
+            img_path (str): Путь к изображению
+
+        Returns:
+            QPixmap: Миниатюра или None, пока она не загружена
+        """
+        if row in self.failed:
+            return None
+
+        cache_key = self.cache_keys.get(row)
+        if cache_key is None:
+            cache_key = pixmap_cache_key(img_path, self.thumbnail_size, self.thumbnail_size)
+            if cache_key is None:
+                self.failed.add(row)
+                return None
+            self.cache_keys[row] = cache_key
+
+        pixmap = QPixmapCache.find(cache_key)
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap
+
+        if row not in self.pending:
+            self.pending.add(row)
+            self.thread_pool.start(ThumbnailLoader(self, self.generation, row, img_path, cache_key))
+
+        return None
+
+    def _set_thumbnail(self, generation, row, cache_key, image):
+        """
+        Сохранение загруженной миниатюры в кэше и обновление строки.
+
+        Args:
+            generation (int): Поколение результатов
+            row (int): Номер результата
+            cache_key (str): Ключ QPixmapCache
+            image (QImage): Миниатюра или None, если изображение не загрузилось
+        """
+        if generation != self.generation:
+            return
+
+        self.pending.discard(row)
+
+        if image is None:
+            self.failed.add(row)
+        else:
+            QPixmapCache.insert(cache_key, QPixmap.fromImage(image))
+
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ResultsDelegate(QStyledItemDelegate):
+    """
+    Отрисовка ячейки результата: рамка, миниатюра, сходство и имя файла.
+    """
+
+    def __init__(self, view, cell_margins=8, info_point_size=None, filename_point_size=None):
+        """
+        Инициализация делегата.
+
+        Args:
+            view (ResultsGrid): Представление, задающее размер ячеек
+            cell_margins (int, optional): Внутренние отступы ячейки
+            info_point_size (int, optional): Размер шрифта метки сходства
+            filename_point_size (int, optional): Размер шрифта имени файла
+        """
+        super(ResultsDelegate, self).__init__(view)
+        self.view = view
+        self.cell_margins = cell_margins
+        self.info_point_size = info_point_size
+        self.filename_point_size = filename_point_size
+
+        # Шрифты подписей и высоты их строк для шрифта представления: (ключ шрифта, шрифты)
+        self._fonts = None
+
+    def sizeHint(self, option, index):
+        """
+        Размер ячейки: все ячейки одинаковы.
+
+        Args:
+            option (QStyleOptionViewItem): Параметры отрисовки
+            index (QModelIndex): Индекс результата
+
+        Returns:
+            QSize: Размер ячейки
+        """
+        return self.view.cell_size
+
+    def _label_fonts(self, base_font):
+        """
+        Шрифты метки сходства и имени файла вместе с высотой их строк.
+        Пересчитываются только при смене шрифта представления.
+
+        Args:
+            base_font (QFont): Шрифт представления
+
+        Returns:
+            tuple: (шрифт сходства, высота, шрифт имени файла, высота строки)
+        """
+        if self._fonts is None or self._fonts[0] != base_font.key():
+            fonts = []
+            for point_size in (self.info_point_size, self.filename_point_size):
+                font = QFont(base_font)
+                if point_size is not None:
+                    font.setPointSize(point_size)
+                fonts.extend([font, QFontMetrics(font).height()])
+
+            self._fonts = (base_font.key(), tuple(fonts))
+
+        return self._fonts[1]
+
+    def paint(self, painter, option, index):
+        """
+        Отрисовка ячейки результата.
+
+        Args:
+            painter (QPainter): Объект рисования
+            option (QStyleOptionViewItem): Параметры отрисовки
+            index (QModelIndex): Индекс результата
+        """
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        rect = QRect(option.rect.topLeft(), self.view.cell_size).adjusted(0, 0, -1, -1)
+        hover = bool(option.state & QStyle.State_MouseOver)
+
+        painter.setPen(QPen(CELL_HOVER_BORDER_COLOR if hover else CELL_BORDER_COLOR, 1))
+        painter.setBrush(CELL_HOVER_BACKGROUND_COLOR if hover else CELL_BACKGROUND_COLOR)
+        painter.drawRoundedRect(rect, 8, 8)
+
+        margins = self.cell_margins
+        content = rect.adjusted(margins, margins, -margins, -margins)
+        info_font, info_height, filename_font, filename_line_height = self._label_fonts(option.font)
+        filename_height = 2 * filename_line_height
+
+        # Миниатюра занимает место над подписями
+        image_rect = QRect(content.left(), content.top(), content.width(),
+                           max(0, content.height() - info_height - filename_height))
+
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is not None:
+            size = pixmap.size()
+            if size.width() > image_rect.width() or size.height() > image_rect.height():
+                size = size.scaled(image_rect.size(), Qt.KeepAspectRatio)
+            target = QRect(0, 0, size.width(), size.height())
+            target.moveCenter(image_rect.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            failed = index.model().is_failed(index.row())
+            painter.setPen(PLACEHOLDER_COLOR)
+            painter.drawText(image_rect, Qt.AlignCenter,
+                             "Не удалось загрузить изображение" if failed else "Загрузка...")
+
+        painter.setPen(option.palette.color(option.palette.Text))
+
+        # Метка с информацией
+        info_rect = QRect(content.left(), image_rect.bottom() + 1, content.width(), info_height)
+        painter.setFont(info_font)
+        painter.drawText(info_rect, Qt.AlignCenter, index.data(SIMILARITY_TEXT_ROLE))
+
+        # Название файла, не более двух строк
+        filename_rect = QRect(content.left(), info_rect.bottom() + 1, content.width(), filename_height)
+        painter.setFont(filename_font)
+        painter.drawText(filename_rect, Qt.AlignHCenter | Qt.AlignTop | Qt.TextWrapAnywhere,
+                         index.data(Qt.DisplayRole))
+
+        painter.restore()
+
+
+class ResultsGrid(QListView):
+    """
+    Представление результатов поиска в виде сетки с фиксированным числом столбцов.
+
+    Все ячейки имеют одинаковый размер (setUniformItemSizes), поэтому
+    представление рассчитывает положение ячеек без обращения к делегату,
+    а отрисовывает и запрашивает миниатюры только для видимых.
+    """
+
+    def __init__(self, columns, thumbnail_size, image_min_size, cell_height, spacing=10,
+                 cell_margins=8, info_point_size=None, filename_point_size=None, parent=None):
+        """
+        Инициализация сетки результатов.
+
+        Args:
+            columns (int): Количество столбцов сетки
+            thumbnail_size (int): Наибольший размер стороны миниатюры
+            image_min_size (tuple): Минимальный размер (ширина, высота) области миниатюры
+            cell_height (int): Высота ячейки результата
+            spacing (int, optional): Расстояние между ячейками
+            cell_margins (int, optional): Внутренние отступы ячейки
+            info_point_size (int, optional): Размер шрифта метки сходства
+            filename_point_size (int, optional): Размер шрифта имени файла
+            parent: Родительский виджет
+        """
+        super(ResultsGrid, self).__init__(parent)
+
+        self.columns = columns
+        self.cell_height = cell_height
+        self.spacing = spacing
+        self.min_cell_width = image_min_size[0] + 2 * cell_margins
+        self.cell_size = QSize()
+
+        self.results_model = ResultsModel(thumbnail_size, self)
+        self.setModel(self.results_model)
+        self.setItemDelegate(ResultsDelegate(self, cell_margins, info_point_size, filename_point_size))
+
+        self.setViewMode(QListView.IconMode)
+        self.setMovement(QListView.Static)
+        self.setResizeMode(QListView.Adjust)
+        self.setWrapping(True)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(LAYOUT_BATCH_SIZE)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setMouseTracking(True)
+        # Прокрутка по строкам сетки: при прокрутке сдвигается целое число строк,
+        # и представлению не нужно отслеживать частично видимые строки
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerItem)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+
+        self.setObjectName("results_grid")
+        self._update_cell_size()
+
+        # Сообщение поверх пустого списка (нет результатов, поиск отменен)
+        self.message_label = QLabel(self.viewport())
+        self.message_label.setAlignment(Qt.AlignHCenter | Qt.AlignTop)
+        self.message_label.setWordWrap(True)
+        self.message_label.hide()
+
+    @property
+    def results(self):
+        """
+        Отображаемые результаты.
+
+        Returns:
+            list: Список кортежей (путь к изображению, сходство)
+        """
+        return self.results_model.results
+
+    def set_message(self, text, style_sheet=""):
+        """
+        Отображение сообщения вместо результатов.
+
+        Args:
+            text (str): Текст сообщения
+            style_sheet (str, optional): Стиль сообщения
+        """
+        self.set_results([])
+        self.message_label.setText(text)
+        self.message_label.setStyleSheet(style_sheet)
+        self.message_label.setGeometry(self.viewport().rect())
+        self.message_label.show()
+
+    def set_results(self, results):
+        """
+        Установка результатов поиска.
+
+        Args:
+            results (list): Список кортежей (путь к изображению, сходство)
+        """
+        self.message_label.hide()
+        self.results_model.set_results(results)
+        self.scrollToTop()
+
+    def clear_cells(self):
+        """
+        Удаление всех результатов из сетки. Виджетов ячеек нет,
+        поэтому достаточно сбросить модель.
+        """
+        self.results_model.set_results([])
+
+    def _update_cell_size(self):
+        """
+        Растяжение ячеек на ширину области так, чтобы в строке помещалось columns ячеек.
+        """
+        width = self.viewport().width()
+        cell_width = max(self.min_cell_width, (width - self.spacing * self.columns) // self.columns)
+
+        if cell_width != self.cell_size.width():
+            self.cell_size = QSize(cell_width, self.cell_height)
+            self.setGridSize(QSize(cell_width + self.spacing, self.cell_height + self.spacing))
+
+    def resizeEvent(self, event):
+        """
+        Пересчет размера ячеек при изменении ширины области.
+
+        Args:
+            event: Событие изменения размера
+        """
+        super(ResultsGrid, self).resizeEvent(event)
+        self._update_cell_size()
+        self.message_label.setGeometry(self.viewport().rect())
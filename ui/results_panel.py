@@ -3,13 +3,10 @@
 Панель результатов поиска изображений.
 """
 
-import os
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QLabel,
-                             QGroupBox, QScrollArea, QProgressBar,
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QProgressBar,
                              QHBoxLayout, QSizePolicy, QFrame)
-from PyQt5.QtCore import Qt
 
-from utils.image_utils import load_image_pixmap
+from ui.results_grid import ResultsGrid, unique_results
 
 
 class ResultsPanel(QWidget):
@@ -69,35 +66,25 @@ class ResultsPanel(QWidget):
         line.setFrameShadow(QFrame.Sunken)
         main_layout.addWidget(line)
 
-        # Область прокрутки для результатов
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-
-        self.results_container = QWidget()
-        self.results_layout = QGridLayout(self.results_container)
-        self.results_layout.setContentsMargins(0, 0, 0, 0)  # Убираем отступы для максимальной области отображения
-        self.results_layout.setSpacing(10)  # Увеличиваем расстояние между миниатюрами
-
-        self.scroll_area.setWidget(self.results_container)
-        main_layout.addWidget(self.scroll_area)
+        # Сетка результатов создает миниатюры только для видимых строк
+        self.results_grid = ResultsGrid(
+            columns=4,
+            thumbnail_size=300,
+            image_min_size=(250, 200),
+            cell_height=380,
+            spacing=10,
+            cell_margins=8
+        )
+        main_layout.addWidget(self.results_grid)
 
         # Добавляем пустое сообщение
-        self.no_results_label = QLabel("Здесь будут отображены результаты поиска")
-        self.no_results_label.setAlignment(Qt.AlignCenter)
-        self.results_layout.addWidget(self.no_results_label, 0, 0)
+        self.results_grid.set_message("Здесь будут отображены результаты поиска")
 
     def clear_results(self):
         """
         Очистка области результатов.
         """
-        # Удаляем все виджеты из макета результатов
-        while self.results_layout.count():
-            item = self.results_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
+        self.results_grid.set_results([])
 
     def set_search_results(self, results):
         """
@@ -106,57 +93,15 @@ class ResultsPanel(QWidget):
         Args:
             results (list): Список кортежей (путь к изображению, сходство)
         """
+        results = unique_results(results)
         self.search_results = results
 
-        # Очищаем макет результатов
-        self.clear_results()
-
         if not results:
             # Добавляем сообщение о том, что результаты не найдены
-            no_results_label = QLabel("Похожие изображения не найдены")
-            no_results_label.setAlignment(Qt.AlignCenter)
-            self.results_layout.addWidget(no_results_label, 0, 0)
+            self.results_grid.set_message("Похожие изображения не найдены")
             return
 
-        # Добавляем результаты в сетку
-        row, col = 0, 0
-        max_cols = 4  # Количество столбцов в сетке
-
-        for i, (img_path, similarity) in enumerate(results):
-            # Создаем группу для изображения и информации
-            result_group = QGroupBox()
-            result_group.setObjectName("result_group")
-            result_layout = QVBoxLayout(result_group)
-            result_layout.setContentsMargins(8, 8, 8, 8)  # Уменьшаем внутренние отступы
-
-            # Загружаем и отображаем миниатюру с увеличенным размером
-            pixmap = load_image_pixmap(img_path, 300, 300)  # Увеличиваем размер миниатюры
-            if pixmap:
-                img_label = QLabel()
-                img_label.setPixmap(pixmap)
-                img_label.setAlignment(Qt.AlignCenter)
-                img_label.setMinimumSize(250, 200)  # Устанавливаем минимальный размер для миниатюры
-                result_layout.addWidget(img_label)
-
-                # Добавляем метку с информацией
-                info_label = QLabel(f"Сходство: {similarity:.2f}")
-                info_label.setAlignment(Qt.AlignCenter)
-                result_layout.addWidget(info_label)
-
-                # Добавляем название файла
-                filename_label = QLabel(os.path.basename(img_path))
-                filename_label.setAlignment(Qt.AlignCenter)
-                filename_label.setWordWrap(True)
-                result_layout.addWidget(filename_label)
-
-                # Добавляем группу в сетку
-                self.results_layout.addWidget(result_group, row, col)
-
-                # Переходим к следующей ячейке сетки
-                col += 1
-                if col >= max_cols:
-                    col = 0
-                    row += 1
+        self.results_grid.set_results(results)
 
     def set_progress(self, value):
         """
@@ -189,11 +134,8 @@ class ResultsPanel(QWidget):
         """
         Отображает сообщение о том, что поиск был отменен пользователем.
         """
-        # Очищаем панель результатов
-        self.clear_results()
-
-        # Добавляем сообщение об отмене
-        cancelled_label = QLabel("Поиск был отменен пользователем")
-        cancelled_label.setAlignment(Qt.AlignCenter)
-        cancelled_label.setStyleSheet("color: var(--error-color); font-size: 14px; margin: 20px;")
-        self.results_layout.addWidget(cancelled_label, 0, 0)
\ No newline at end of file
+        # Заменяем результаты сообщением об отмене
+        self.results_grid.set_message(
+            "Поиск был отменен пользователем",
+            "color: var(--error-color); font-size: 14px; margin: 20px;"
+        )
\ No newline at end of file
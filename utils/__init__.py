@@ -1,16 +1,45 @@
 # -*- coding: utf-8 -*-
 """
 Пакет с утилитами для приложения.
+
+Функции импортируются из модулей пакета при первом обращении,
+поэтому импорт utils.file_utils не загружает OpenCV из utils.image_utils.
 """
 
-from utils.image_utils import load_image_pixmap, cv_to_qpixmap, resize_image
-from utils.file_utils import get_image_files, create_results_folder, save_search_results
-
-__all__ = [
-    'load_image_pixmap',
-    'cv_to_qpixmap',
-    'resize_image',
-    'get_image_files',
-    'create_results_folder',
-    'save_search_results'
-]
\ No newline at end of file
+import importlib
+
+# Модуль пакета, в котором определена каждая функция
+_EXPORTS = {
+    'load_image_pixmap': 'utils.image_utils',
+    'load_image_thumbnail': 'utils.image_utils',
+    'pixmap_cache_key': 'utils.image_utils',
+    'cv_to_qpixmap': 'utils.image_utils',
+    'resize_image': 'utils.image_utils',
+    'get_image_files': 'utils.file_utils',
+    'get_image_files_cached': 'utils.file_utils',
+    'create_results_folder': 'utils.file_utils',
+    'save_search_results': 'utils.file_utils'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    """
+    Импорт функции пакета при первом обращении к ней.
+
+    Args:
+        name (str): Имя атрибута
+
+    Returns:
+        Функция из модуля пакета
+
+    Raises:
+        AttributeError: Если пакет не экспортирует такое имя
+    """
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
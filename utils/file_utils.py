@@ -4,9 +4,56 @@
 """
 
 import os
+import json
 import shutil
-from pathlib import Path
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'})
+
+# Служебная папка внутри папки изображений: файлы индексов и список изображений
+INDEX_DIR_NAME = ".index"
+
+# Файл со списком изображений папки в ее папке .index
+LISTING_FILE_NAME = "listing.json"
+
+# Наибольшее количество потоков копирования результатов: копирование
+# ограничено задержкой вызовов ввода-вывода, во время которых GIL отпущен
+MAX_COPY_THREADS = 8
+
+# Количество папок, списки изображений которых хранятся в памяти
+LISTING_CACHE_SIZE = 32
+
+# Списки изображений, уже прочитанные в этом процессе: {папка: (mtime_ns папки, список путей)}.
+# Порядок ключей - порядок последнего обращения, первой вытесняется давно не использованная папка
+_listing_cache = OrderedDict()
+
+
+def _scan_image_names(folder_path):
+    """
+    Чтение имен файлов изображений папки за один проход os.scandir.
+    Расширение сравнивается без учета регистра, а тип записи берется
+    из результата чтения папки без отдельного вызова stat.
+
+    Args:
+        folder_path (str): Путь к папке
+
+    Returns:
+        list: Отсортированный список имен файлов изображений
+
+    Raises:
+        OSError: Если папку не удалось прочитать
+    """
+    # Функция и множество расширений берутся в локальные имена один раз на папку
+    splitext = os.path.splitext
+    extensions = IMAGE_EXTENSIONS
+
+    with os.scandir(folder_path) as entries:
+        return sorted(
+            entry.name for entry in entries
+            if splitext(entry.name)[1].lower() in extensions and entry.is_file()
+        )
 
 
 def get_image_files(folder_path):
@@ -19,14 +66,73 @@ def get_image_files(folder_path):
     Returns:
         list: Список путей к файлам изображений
     """
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
-    image_files = []
+    try:
+        names = _scan_image_names(folder_path)
+    except OSError as e:
+        print(f"Ошибка при чтении папки {folder_path}: {e}")
+        return []
+
+    return [os.path.join(folder_path, name) for name in names]
+
+
+def get_image_files_cached(folder_path):
+    """
+    Получает список файлов изображений папки, перечитывая папку только после ее изменения.
+
+    Добавление, удаление и переименование файлов меняют время изменения папки,
+    поэтому список, сохраненный при том же времени, остается верным. Список хранится
+    в памяти и в файле .index/listing.json, чтобы не перечитывать папку при следующем запуске.
+
+    Args:
+        folder_path (str): Путь к папке
+
+    Returns:
+        list: Список путей к файлам изображений
+    """
+    index_dir = os.path.join(folder_path, INDEX_DIR_NAME)
+    listing_path = os.path.join(index_dir, LISTING_FILE_NAME)
+
+    try:
+        # Создание папки .index меняет время изменения самой папки,
+        # поэтому она создается до чтения этого времени
+        os.makedirs(index_dir, exist_ok=True)
+        folder_mtime = os.stat(folder_path).st_mtime_ns
+    except OSError:
+        return get_image_files(folder_path)
+
+    cached = _listing_cache.get(folder_path)
+    if cached is not None and cached[0] == folder_mtime:
+        _listing_cache.move_to_end(folder_path)
+        return cached[1]
+
+    image_files = None
+
+    try:
+        with open(listing_path, 'r', encoding='utf-8') as f:
+            listing = json.load(f)
+        if listing['mtime_ns'] == folder_mtime:
+            image_files = [os.path.join(folder_path, name) for name in listing['files']]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if image_files is None:
+        names = _scan_image_names(folder_path)
+        image_files = [os.path.join(folder_path, name) for name in names]
+
+        # Папка может быть доступна только для чтения, тогда список хранится только в памяти
+        try:
+            with open(listing_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({'mtime_ns': folder_mtime, 'files': names}, f, ensure_ascii=False)
+            os.replace(listing_path + ".tmp", listing_path)
+        except OSError as e:
+            print(f"Не удалось сохранить список изображений {listing_path}: {e}")
 
-    for ext in image_extensions:
-        image_files.extend(list(Path(folder_path).glob(f'*{ext}')))
-        image_files.extend(list(Path(folder_path).glob(f'*{ext.upper()}')))
+    _listing_cache[folder_path] = (folder_mtime, image_files)
+    _listing_cache.move_to_end(folder_path)
+    while len(_listing_cache) > LISTING_CACHE_SIZE:
+        _listing_cache.popitem(last=False)
 
-    return [str(path) for path in image_files]
+    return image_files
 
 
 def create_results_folder(base_folder, query_name):
@@ -72,22 +178,34 @@ def save_search_results(query_image_path, results, result_dir, extractor_name, s
         query_dest = os.path.join(result_dir, f"query_{os.path.basename(query_image_path)}")
         shutil.copy2(query_image_path, query_dest)
 
-        # Копируем результаты
-        for i, (img_path, similarity) in enumerate(results):
-            ext = os.path.splitext(img_path)[1]
-            dest_path = os.path.join(result_dir, f"result_{i + 1:03d}_sim_{similarity:.2f}{ext}")
-            shutil.copy2(img_path, dest_path)
+        # Копируем результаты в несколько потоков
+        sources = [img_path for img_path, _ in results]
+        destinations = [
+            os.path.join(result_dir, f"result_{i + 1:03d}_sim_{similarity:.2f}{os.path.splitext(img_path)[1]}")
+            for i, (img_path, similarity) in enumerate(results)
+        ]
+
+        if sources:
+            with ThreadPoolExecutor(max_workers=min(MAX_COPY_THREADS, len(sources))) as executor:
+                # Ошибка любого копирования передается сюда при чтении результатов
+                list(executor.map(shutil.copy2, sources, destinations))
+
+        # Создаем текстовый файл с информацией: текст собирается целиком
+        # и записывается одним вызовом
+        lines = [
+            f"Запрос: {query_image_path}\n",
+            f"Модель: {extractor_name}\n",
+            f"Коэффициент похожести: {similarity_threshold}\n",
+            f"Количество результатов: {len(results)}\n",
+            f"Дата и время поиска: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        ]
+        lines.extend(
+            f"{i + 1}. {img_path} - сходство: {similarity:.4f}\n"
+            for i, (img_path, similarity) in enumerate(results)
+        )
 
-        # Создаем текстовый файл с информацией
         with open(os.path.join(result_dir, "info.txt"), "w", encoding="utf-8") as f:
-            f.write(f"Запрос: {query_image_path}\n")
-            f.write(f"Модель: {extractor_name}\n")
-            f.write(f"Коэффициент похожести: {similarity_threshold}\n")
-            f.write(f"Количество результатов: {len(results)}\n")
-            f.write(f"Дата и время поиска: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-            for i, (img_path, similarity) in enumerate(results):
-                f.write(f"{i + 1}. {img_path} - сходство: {similarity:.4f}\n")
+            f.write("".join(lines))
 
         return True
 
@@ -3,14 +3,29 @@
 Утилиты для работы с изображениями.
 """
 
+import os
+import logging
 import cv2
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QPixmapCache
 from PyQt5.QtCore import Qt
 
+logger = logging.getLogger(__name__)
 
-def load_image_pixmap(image_path, max_width=None, max_height=None):
+# Размер кэша масштабированных изображений в килобайтах
+PIXMAP_CACHE_LIMIT_KB = 128 * 1024
+
+# Флаги OpenCV для декодирования с уменьшением, от наибольшего коэффициента
+REDUCED_READ_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+
+def pixmap_cache_key(image_path, max_width=None, max_height=None):
     """
-    Загружает изображение и возвращает QPixmap.
+    Ключ QPixmapCache для изображения: путь, время изменения,
+    размер файла и запрошенные размеры.
 
     Args:
         image_path (str): Путь к изображению
@@ -18,29 +33,84 @@ def load_image_pixmap(image_path, max_width=None, max_height=None):
         max_height (int, optional): Максимальная высота
 
     Returns:
-        QPixmap: Объект QPixmap или None при ошибке
+        str: Ключ или None, если файл недоступен
     """
     try:
-        pixmap = QPixmap(image_path)
+        st = os.stat(image_path)
+    except OSError:
+        return None
 
-        if pixmap.isNull():
-            return None
+    return f"{image_path}|{st.st_mtime_ns}|{st.st_size}|{max_width}x{max_height}"
+
+
+def load_image_thumbnail(image_path, max_width=None, max_height=None):
+    """
+    Загружает и масштабирует изображение в QImage.
+    В отличие от QPixmap, QImage можно создавать вне потока интерфейса.
+
+    Размер задается декодеру до чтения, поэтому JPEG сразу декодируется
+    с уменьшением, а не в полном разрешении с последующим масштабированием.
+
+    Args:
+        image_path (str): Путь к изображению
+        max_width (int, optional): Максимальная ширина
+        max_height (int, optional): Максимальная высота
+
+    Returns:
+        QImage: Объект QImage или None при ошибке
+    """
+    try:
+        reader = QImageReader(image_path)
 
         # Масштабирование, если указаны размеры
         if max_width is not None and max_height is not None:
-            pixmap = pixmap.scaled(
-                max_width,
-                max_height,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
+            size = reader.size()
+            if size.isValid():
+                reader.setScaledSize(size.scaled(max_width, max_height, Qt.KeepAspectRatio))
 
-        return pixmap
+        image = reader.read()
+
+        if image.isNull():
+            return None
+
+        return image
 
     except Exception as e:
-        print(f"Ошибка при загрузке изображения {image_path}: {e}")
+        logger.debug("Ошибка при загрузке изображения %s: %s", image_path, e)
+        return None
+
+
+def load_image_pixmap(image_path, max_width=None, max_height=None):
+    """
+    Загружает изображение и возвращает QPixmap.
+
+    Результат хранится в QPixmapCache с ключом pixmap_cache_key, поэтому
+    повторный показ того же изображения не декодирует и не масштабирует файл заново.
+
+    Args:
+        image_path (str): Путь к изображению
+        max_width (int, optional): Максимальная ширина
+        max_height (int, optional): Максимальная высота
+
+    Returns:
+        QPixmap: Объект QPixmap или None при ошибке
+    """
+    cache_key = pixmap_cache_key(image_path, max_width, max_height)
+    if cache_key is None:
+        return None
+
+    pixmap = QPixmapCache.find(cache_key)
+    if pixmap is not None and not pixmap.isNull():
+        return pixmap
+
+    image = load_image_thumbnail(image_path, max_width, max_height)
+    if image is None:
         return None
 
+    pixmap = QPixmap.fromImage(image)
+    QPixmapCache.insert(cache_key, pixmap)
+    return pixmap
+
 
 def cv_to_qpixmap(cv_img):
     """
@@ -55,24 +125,27 @@ def cv_to_qpixmap(cv_img):
     try:
         height, width, channels = cv_img.shape
 
-        # Преобразование BGR -> RGB
-        rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
+        # QImage читает строки подряд, поэтому срез массива копируется
+        if not cv_img.flags['C_CONTIGUOUS']:
+            cv_img = cv_img.copy()
 
-        # Создание QImage
+        # Qt читает порядок каналов BGR напрямую (Format_BGR888, Qt 5.14+),
+        # без промежуточной копии RGB. QPixmap.fromImage копирует пиксели,
+        # поэтому буфер массива нужен только до конца функции
         bytes_per_line = channels * width
         q_img = QImage(
-            rgb_image.data,
+            cv_img.data,
             width,
             height,
             bytes_per_line,
-            QImage.Format_RGB888
+            QImage.Format_BGR888
         )
 
         # Создание QPixmap
         return QPixmap.fromImage(q_img)
 
     except Exception as e:
-        print(f"Ошибка при преобразовании изображения OpenCV в QPixmap: {e}")
+        logger.debug("Ошибка при преобразовании изображения OpenCV в QPixmap: %s", e)
         return None
 
 
@@ -80,6 +153,11 @@ def resize_image(image_path, max_dim=800):
     """
     Загружает и изменяет размер изображения для предварительной обработки.
 
+    Размер файла читается из заголовка без декодирования. Если изображение
+    больше max_dim хотя бы вдвое, оно декодируется сразу с уменьшением
+    в 2, 4 или 8 раз (для JPEG - внутри libjpeg), а до точного размера
+    уменьшается только промежуточное изображение.
+
     Args:
         image_path (str): Путь к изображению
         max_dim (int): Максимальный размер большей стороны
@@ -88,8 +166,17 @@ def resize_image(image_path, max_dim=800):
         numpy.ndarray: Измененное изображение или None при ошибке
     """
     try:
+        # Наибольший коэффициент уменьшения, при котором большая сторона не меньше max_dim
+        read_flag = cv2.IMREAD_COLOR
+        size = QImageReader(image_path).size()
+        if size.isValid():
+            for factor, flag in REDUCED_READ_FLAGS:
+                if max(size.width(), size.height()) // factor >= max_dim:
+                    read_flag = flag
+                    break
+
         # Загрузка изображения
-        img = cv2.imread(image_path)
+        img = cv2.imread(image_path, read_flag)
 
         if img is None:
             return None
@@ -118,5 +205,5 @@ def resize_image(image_path, max_dim=800):
         return img
 
     except Exception as e:
-        print(f"Ошибка при изменении размера изображения {image_path}: {e}")
+        logger.debug("Ошибка при изменении размера изображения %s: %s", image_path, e)
         return None
\ No newline at end of file
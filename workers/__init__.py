@@ -5,5 +5,6 @@
 
 from workers.search_worker import SearchWorker
 from workers.index_worker import IndexWorker
+from workers.index_scan_worker import IndexScanWorker
 
-__all__ = ['SearchWorker', 'IndexWorker']
\ No newline at end of file
+__all__ = ['SearchWorker', 'IndexWorker', 'IndexScanWorker']
\ No newline at end of file
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Рабочий поток для поиска существующих индексов папки.
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class IndexScanWorker(QThread):
+    """
+    Рабочий поток для поиска существующих индексов папки.
+    На сетевых папках чтение .index может занимать заметное время,
+    поэтому оно выполняется вне потока интерфейса.
+
+    Signals:
+        indexes_found (list): Сигнал со списком найденных индексов
+    """
+    indexes_found = pyqtSignal(list)
+
+    def __init__(self, registry, folder_path):
+        """
+        Инициализация рабочего потока.
+
+        Args:
+            registry (IndexRegistry): Реестр индексов
+            folder_path (str): Путь к папке с изображениями
+        """
+        super().__init__()
+        self.registry = registry
+        self.folder_path = folder_path
+
+    def run(self):
+        """
+        Чтение списка индексов папки.
+        """
+        try:
+            indexes = list(self.registry.get(self.folder_path))
+        except Exception as e:
+            print(f"Ошибка при поиске индексов в {self.folder_path}: {e}")
+            indexes = []
+
+        self.indexes_found.emit(indexes)
@@ -4,7 +4,7 @@
 """
 
 from PyQt5.QtCore import QThread, pyqtSignal, QMutex, QMutexLocker
-from batch_processing.feature_indexer import FeatureIndexer
+from batch_processing.feature_indexer import FeatureIndexer, MODE_APPEND
 
 
 class IndexWorker(QThread):
@@ -22,7 +22,7 @@ class IndexWorker(QThread):
     index_failed = pyqtSignal(str)
     index_cancelled = pyqtSignal()
 
-    def __init__(self, folder_path, extractor, output_path=None):
+    def __init__(self, folder_path, extractor, output_path=None, mode=MODE_APPEND):
         """
         Инициализация рабочего потока для индексации.
 
@@ -30,11 +30,13 @@ class IndexWorker(QThread):
             folder_path (str): Путь к папке с изображениями
             extractor: Экстрактор признаков
             output_path (str, optional): Путь для сохранения индекса
+            mode (str, optional): Режим индексации (MODE_APPEND, MODE_REBUILD или MODE_PRUNE)
         """
         super().__init__()
         self.folder_path = folder_path
         self.extractor = extractor
         self.output_path = output_path
+        self.mode = mode
 
         # Флаги для контроля выполнения
         self.mutex = QMutex()
@@ -58,7 +60,8 @@ class IndexWorker(QThread):
             self.indexer = FeatureIndexer(
                 self.folder_path,
                 self.extractor,
-                self.output_path
+                self.output_path,
+                self.mode
             )
 
             # Подключаем сигналы
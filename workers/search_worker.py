@@ -3,9 +3,61 @@
 Рабочий поток для поиска похожих изображений.
 """
 
-from pathlib import Path
+import os
+import heapq
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
 from PyQt5.QtCore import QThread, pyqtSignal, QMutex, QMutexLocker
 
+from batch_processing.feature_indexer import MAX_PROCESS_WORKERS
+from utils.file_utils import get_image_files_cached
+
+logger = logging.getLogger(__name__)
+
+# Количество изображений между проверками флага остановки: флаг читается
+# под мьютексом, а для изображений из кэша признаков сама обработка дешевле
+CANCEL_CHECK_INTERVAL = 16
+
+# Экстрактор и признаки запроса, с которыми работает дочерний процесс пула
+_process_extractor = None
+_process_query_features = None
+
+
+def _init_process(extractor, query_features):
+    """
+    Инициализация дочернего процесса пула поиска.
+
+    Args:
+        extractor: Экстрактор признаков
+        query_features: Признаки изображения запроса
+    """
+    global _process_extractor, _process_query_features
+    _process_extractor = extractor
+    _process_query_features = query_features
+    _process_extractor.init_worker_process()
+
+
+def _score_in_process(image_path):
+    """
+    Извлечение признаков и сравнение с запросом в дочернем процессе пула.
+    Сравнение выполняется там же, чтобы не передавать признаки между процессами.
+
+    Args:
+        image_path (str): Путь к изображению
+
+    Returns:
+        float: Сходство с запросом или None, если признаки не извлечены
+    """
+    try:
+        features = _process_extractor.extract_features(image_path)
+        if features is None or len(features) == 0:
+            return None
+        return _process_extractor.compare_features(_process_query_features, features)
+    except Exception as e:
+        logger.debug("Ошибка при обработке %s: %s", image_path, e)
+        return None
+
 
 class SearchWorker(QThread):
     """
@@ -53,6 +105,49 @@ class SearchWorker(QThread):
             self.running = False
             self.cancelled = True
 
+    def _iter_similarities(self, query_features, image_files):
+        """
+        Сравнивает изображения с запросом в порядке списка.
+
+        Экстракторы с use_process_pool обрабатываются пулом процессов,
+        остальные - пакетами по batch_size изображений в текущем потоке.
+
+        Args:
+            query_features: Признаки изображения запроса
+            image_files (list): Список путей к изображениям
+
+        Yields:
+            tuple: (путь_к_изображению, сходство или None)
+        """
+        if self.extractor.use_process_pool and len(image_files) > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, MAX_PROCESS_WORKERS),
+                initializer=_init_process,
+                initargs=(self.extractor, query_features)
+            )
+            try:
+                yield from zip(image_files, executor.map(_score_in_process, image_files, chunksize=16))
+            finally:
+                # При отмене поиска необработанные пакеты снимаются с очереди
+                executor.shutdown(wait=True, cancel_futures=True)
+            return
+
+        # Нейросетевые экстракторы обрабатывают пакет за один прямой проход
+        batch_size = self.extractor.batch_size
+        for start in range(0, len(image_files), batch_size):
+            batch = image_files[start:start + batch_size]
+
+            for img_path, current_features in zip(batch, self.extractor.extract_features_batch(batch)):
+                similarity = None
+                try:
+                    if current_features is not None and len(current_features) > 0:
+                        # Сравниваем дескрипторы
+                        similarity = self.extractor.compare_features(query_features, current_features)
+                except Exception as e:
+                    logger.debug("Ошибка при обработке %s: %s", img_path, e)
+
+                yield img_path, similarity
+
     def run(self):
         """
         Основной метод, выполняющийся в отдельном потоке.
@@ -66,16 +161,13 @@ class SearchWorker(QThread):
                 self.error_occurred.emit("Не удалось извлечь признаки из изображения запроса")
                 return
 
-            # Список для хранения результатов (путь к изображению, сходство)
+            # Результаты (сходство, путь к изображению). При ограничении количества
+            # это min-куча из max_results лучших: худший из них всегда в results[0]
             results = []
 
-            # Получаем список всех файлов изображений в папке
-            image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
-            image_files = []
-
-            for ext in image_extensions:
-                image_files.extend(list(Path(self.search_folder).glob(f'*{ext}')))
-                image_files.extend(list(Path(self.search_folder).glob(f'*{ext.upper()}')))
+            # Получаем список всех файлов изображений в папке.
+            # Папка перечитывается, только если она изменилась с прошлого поиска
+            image_files = get_image_files_cached(self.search_folder)
 
             total_files = len(image_files)
 
@@ -85,38 +177,41 @@ class SearchWorker(QThread):
                 self.progress_update.emit(100)
                 return
 
-            for i, img_path in enumerate(image_files):
-                # Проверяем, не была ли запрошена остановка
-                with QMutexLocker(self.mutex):
-                    if not self.running:
-                        # Если работа была отменена, отправляем сигнал
-                        if self.cancelled:
-                            self.search_cancelled.emit()
-                        break
-
-                # Обновляем прогресс
-                self.progress_update.emit(int(100 * i / total_files))
-
-                try:
-                    # Получаем дескрипторы текущего изображения
-                    current_features = self.extractor.extract_features(str(img_path))
-
-                    if current_features is not None and len(current_features) > 0:
-                        # Сравниваем дескрипторы
-                        similarity = self.extractor.compare_features(query_features, current_features)
-
-                        # Если сходство выше порога, добавляем в результаты
-                        if similarity >= self.similarity_threshold:
-                            results.append((str(img_path), similarity))
-                except Exception as e:
-                    print(f"Ошибка при обработке {img_path}: {e}")
-
-            # Сортируем результаты по сходству (по убыванию)
-            results.sort(key=lambda x: x[1], reverse=True)
-
-            # Ограничиваем количество результатов, если указано
-            if self.max_results > 0:
-                results = results[:self.max_results]
+            similarities = self._iter_similarities(query_features, image_files)
+            last_progress = None
+
+            try:
+                for i, (img_path, similarity) in enumerate(similarities):
+                    # Проверяем, не была ли запрошена остановка
+                    if i % CANCEL_CHECK_INTERVAL == 0:
+                        with QMutexLocker(self.mutex):
+                            if not self.running:
+                                # Если работа была отменена, отправляем сигнал
+                                if self.cancelled:
+                                    self.search_cancelled.emit()
+                                break
+
+                    # Обновляем прогресс, только если изменилось значение в процентах
+                    progress = int(100 * (i + 1) / total_files)
+                    if progress != last_progress:
+                        last_progress = progress
+                        self.progress_update.emit(progress)
+
+                    # Если сходство выше порога, добавляем в результаты
+                    if similarity is None or similarity < self.similarity_threshold:
+                        continue
+
+                    if self.max_results <= 0 or len(results) < self.max_results:
+                        heapq.heappush(results, (similarity, img_path))
+                    elif similarity > results[0][0]:
+                        heapq.heapreplace(results, (similarity, img_path))
+            finally:
+                # Закрываем пул процессов, в том числе при отмене поиска
+                similarities.close()
+
+            # Сортируем результаты по сходству (по убыванию). При ограничении
+            # количества сортируются только max_results оставшихся в куче
+            results = [(img_path, similarity) for similarity, img_path in sorted(results, reverse=True)]
 
             # Отправляем результаты
             self.result_ready.emit(results)